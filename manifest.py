@@ -0,0 +1,32 @@
+# Manifest per congelare i moduli di SmartThermo nel firmware MicroPython (ESP32-C3)
+#
+# Uso (dalla cartella ports/esp32 del sorgente MicroPython):
+#   make BOARD=ESP32_GENERIC_C3 FROZEN_MANIFEST=/percorso/SmartThermo/manifest.py
+#
+# I moduli congelati vengono eseguiti direttamente dalla flash: l'import non
+# compila sorgenti e il bytecode non occupa heap. Sul filesystem restano solo
+# boot.py, main.py, config.json e la cartella static/ (i path sono relativi
+# a questo file).
+
+include("$(PORT_DIR)/boards/manifest.py")
+
+freeze(
+    "src",
+    (
+        "app.py",
+        "setup.py",
+        "setup_schema.py",
+        "menu.py",
+        "config.py",
+        "modutil.py",
+        "pid_controller.py",
+        "buzzer.py",
+        "bignum.py",
+        "tapo_control.py",
+        "web_server.py",
+        "wifi_manager.py",
+        "drivers/mlx90614.py",
+        "drivers/ssd1306.py",
+    ),
+    opt=3,
+)
@@ -3,14 +3,92 @@ App principale SmartThermo
 Gestisce display, sensore, WiFi, web server e tre modalità operative
 """
 import gc
+import sys
 import time
-from machine import Pin
+from time import ticks_ms, ticks_diff, ticks_add
+import micropython
+import framebuf
+from array import array
+from micropython import const
+from machine import Pin, disable_irq, enable_irq
 from drivers.mlx90614 import MLX90614
 from wifi_manager import WiFiManager
-from web_server import WebServer
 from config import Config
-from pid_controller import PIDController
-from buzzer import Buzzer
+from modutil import unload
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+# Costanti del loop (inlined a compile-time da const())
+_MAX_HISTORY = const(128)       # Punti dello storico = larghezza display (potenza di 2)
+_HIST_MASK = const(127)
+_DEBOUNCE_MS = const(200)
+_RELAX_MS = const(50)           # Periodo di rilassamento anti-rimbalzo nell'IRQ
+_INPUT_MS = const(20)
+_DISPLAY_MS = const(100)
+_GRAPH_MS = const(500)          # Il grafico cambia al più una volta per campione
+_WEB_MS = const(1000)
+_THERMOSTAT_MS = const(500)
+_GC_MS = const(5000)
+_GC_MIN_FREE = const(8192)
+_TAPO_MIN_INTERVAL_MS = const(10000)  # Intervallo minimo tra due commutazioni della presa
+_TAPO_SERVICE_MS = const(1000)
+_SAVE_IDLE_MS = const(2000)  # Salvataggio config dopo 2 s senza modifiche
+
+# Pulsanti: un bit per pulsante nelle maschere di pressione
+_BTN_FIRE = const(1)
+_BTN_UP = const(2)
+_BTN_DOWN = const(4)
+_BTN_LEFT = const(8)
+_BTN_RIGHT = const(16)
+_N_BUTTONS = const(5)
+_GPIO_IN_REG = const(0x6000403C)  # ESP32-C3: livello di tutti i GPIO in un registro
+
+# Glifi delle cifre: stringhe costanti, disegnate senza allocare
+_DIGITS = ('0', '1', '2', '3', '4', '5', '6', '7', '8', '9')
+
+# Area grafico: y da 15 a 52
+_GRAPH_TOP = const(15)
+_GRAPH_HEIGHT = const(38)
+_GRAPH_BOTTOM = const(52)
+
+
+@micropython.viper
+def _read_buttons(pins: ptr8) -> int:
+    """
+    Maschera dei pulsanti premuti da una sola lettura di GPIO_IN (pulsanti attivi bassi)
+
+    pins: numeri di GPIO nell'ordine dei bit _BTN_*
+    """
+    level = int(ptr32(_GPIO_IN_REG)[0])
+    mask = 0
+    for i in range(_N_BUTTONS):
+        if (level >> int(pins[i])) & 1 == 0:
+            mask |= 1 << i
+    return mask
+
+
+@micropython.viper
+def _scale_history(hist: ptr32, out: ptr8, params: ptr32, n: int):
+    """
+    Converte lo storico in coordinate Y del grafico (solo interi: niente float in viper)
+
+    hist: temperature in centesimi di grado (buffer circolare)
+    params: [indice del più vecchio, minimo in centesimi, fattore di scala Q16]
+    """
+    start = params[0]
+    min_fp = params[1]
+    k = params[2]
+    for i in range(n):
+        y = (_GRAPH_TOP + _GRAPH_HEIGHT) - (((hist[(start + i) & _HIST_MASK] - min_fp) * k) >> 16)
+        # Clamp senza salti: max(y, TOP) poi min(y, BOTTOM)
+        t = y - _GRAPH_TOP
+        t = t & ((t >> 31) ^ -1)
+        u = (_GRAPH_BOTTOM - _GRAPH_TOP) - t
+        u = u & ((u >> 31) ^ -1)
+        out[i] = _GRAPH_BOTTOM - u
 
 
 class ThermoApp:
@@ -26,6 +104,12 @@ class ThermoApp:
     READING_ONSHOOT = "OnShoot"
     READING_CONTINUE = "Continue"
 
+    # Stato del laser per modalità di lettura
+    _LASER_MODE = {
+        READING_CONTINUE: lambda self: 1,  # Sempre acceso
+        READING_ONSHOOT: lambda self: 1 if _read_buttons(self._btn_pins) & _BTN_FIRE else 0  # Con FIRE premuto
+    }
+
     def __init__(self, display, i2c):
         """
         Inizializza l'applicazione
@@ -38,6 +122,10 @@ class ThermoApp:
         self.i2c = i2c
         self.config = Config()
 
+        # Copie locali dei valori di config letti nei task (vedi _sync_config)
+        self._cfg_version = -1
+        self._sync_config()
+
         if self.config.bignum_enabled:
             from bignum import BigNum
             self.big = BigNum(self.display)
@@ -51,13 +139,55 @@ class ThermoApp:
         self.object_temp_raw = None  # Temperatura raw (non calibrata)
         self.ambient_temp = None
         self.last_reading_time = 0
+        self._last_buzzer_freq = -1  # Ultima frequenza del tono in Continue
 
         # Stato termostato
         self.editing_target = False  # Flag per editing target in modalità thermostat
 
+        # Stato display: chiave dell'ultimo frame disegnato e flag di ridisegno forzato
+        self._last_frame_key = None
+        self._dirty = True
+        self._graph_due = 0  # Prossimo ridisegno consentito in modalità grafico
+
+        # Header e footer pre-renderizzati (strisce 128x8, stesso formato del display)
+        self._header_fb = framebuf.FrameBuffer(bytearray(128), 128, 8, framebuf.MONO_VLSB)
+        self._header_fb_text = None
+        self._footer_fbs = {}  # Chiave: (modalità, editing)
+
+        # Disegno del contenuto per modalità (indice = MODE_*)
+        self._mode_handlers = (self._draw_reading_mode, self._draw_thermostat_mode, self._draw_graph_mode)
+
+        # Stringhe ricostruite solo quando cambia il valore sorgente
+        self._hdr_state = None  # (sta connesso, ap attivo)
+        self._hdr_text = "WiFi:Off"
+        self._tgt_key = None  # (target, editing)
+        self._tgt_text = ""
+        self._pid_key = None  # (output %, acceso)
+        self._pid_text = ""
+
+
+        # Modalità disponibili in questa build
+        self._modes = [self.MODE_READING]
+        if self.config.thermostat_enabled:
+            self._modes.append(self.MODE_THERMOSTAT)
+        if self.config.graph_enabled:
+            self._modes.append(self.MODE_GRAPH)
+
         # Storico per grafico (ultimi 128 punti = larghezza display)
-        self.temp_history = []
-        self.max_history = 128
+        # Buffer circolare a dimensione fissa: _hist_idx è la prossima posizione da scrivere
+        # Non allocato se il grafico è disattivato
+        self.temp_history = array('f', [0.0] * _MAX_HISTORY) if self.config.graph_enabled else None
+        self._hist_idx = 0
+        self._hist_len = 0
+        # Copia in centesimi di grado per il disegno in viper, più i buffer di lavoro
+        if self.temp_history is not None:
+            self._hist_fp = array('i', [0] * _MAX_HISTORY)
+            self._graph_y = bytearray(_MAX_HISTORY)
+            self._graph_params = array('i', [0, 0, 0])
+        # Estremi correnti dello storico (centesimi), aggiornati ad ogni campione
+        self._hist_min = 0
+        self._hist_max = 0
+        self._extrema_dirty = False  # Uscito un estremo: ricalcolo al prossimo disegno
 
         # Inizializza hardware
         self._init_hardware()
@@ -65,26 +195,46 @@ class ThermoApp:
         # Inizializza WiFi
         self.wifi_manager = WiFiManager(self.config)
 
-        # Inizializza web server
+        # Stato condiviso con il web server (creato in start() solo se c'è rete)
         self.app_state = {
             'object_temp': None,
             'object_temp_raw': None,
             'ambient_temp': None,
             'last_reading': 0
         }
-        self.web_server = WebServer(self.wifi_manager, self.config, self.sensor, self.app_state)
-
-        # Inizializza PID per termostato
-        self.pid = PIDController(
-            self.config.thermostat_p,
-            self.config.thermostat_i,
-            self.config.thermostat_d,
-            self.config.thermostat_target
-        )
+        self.web_server = None
+
+        # Inizializza PID per termostato (importato solo se la funzione è attiva)
+        self.pid = None
+        if self.config.thermostat_enabled:
+            from pid_controller import PIDController
+            self.pid = PIDController(
+                self.config.thermostat_p,
+                self.config.thermostat_i,
+                self.config.thermostat_d,
+                self.config.thermostat_target
+            )
 
         # Tapo controller (lazy init)
         self.tapo = None
 
+        # Stato desiderato della presa (None = nessuna richiesta), servito da _service_tapo
+        self._tapo_desired = None
+        self._tapo_changed = 0
+        self._tapo_due = ticks_ms()
+        self._autotuning = False
+
+        # Modifiche da pulsanti non ancora scritte su flash (salvate a riposo)
+        self._config_dirty = False
+        self._config_edit = ticks_ms()
+
+        # Ultimo output PID calcolato dal termostato (letto dal display)
+        self._last_pid_output = 0.0
+
+        # Garbage collection: lascia che il runtime raccolga da solo vicino alla soglia
+        self._gc_due = ticks_add(ticks_ms(), _GC_MS)
+        gc.threshold(gc.mem_free() // 4 + gc.mem_alloc())
+
     @property
     def effective_temp(self):
         """
@@ -92,7 +242,7 @@ class ThermoApp:
         Se calibration è abilitata usa object_temp (calibrata)
         Altrimenti usa object_temp_raw (non calibrata)
         """
-        if self.config.calibration_enabled:
+        if self._calibration_enabled:
             return self.object_temp
         else:
             return self.object_temp_raw
@@ -120,13 +270,43 @@ class ThermoApp:
 
         # Buzzer
         try:
+            from buzzer import Buzzer
             self.buzzer = Buzzer(self.config.PIN_BUZZER)
         except:
             self.buzzer = None
 
         # Debouncing
         self.last_btn_time = 0
-        self.debounce_ms = 200
+
+        # Pulsanti via IRQ: l'handler registra la pressione in una maschera di bit,
+        # _handle_input la consuma
+        self._btn_bits = {
+            self.btn_fire: _BTN_FIRE,
+            self.btn_up: _BTN_UP,
+            self.btn_down: _BTN_DOWN,
+            self.btn_left: _BTN_LEFT,
+            self.btn_right: _BTN_RIGHT
+        }
+        # GPIO dei pulsanti nell'ordine dei bit, per la lettura a registro intero
+        self._btn_pins = bytearray((
+            self.config.PIN_FIRE,
+            self.config.PIN_UP,
+            self.config.PIN_DOWN,
+            self.config.PIN_LEFT,
+            self.config.PIN_RIGHT
+        ))
+        self._pending = 0
+        self._last_irq = {_BTN_FIRE: 0, _BTN_UP: 0, _BTN_DOWN: 0, _BTN_LEFT: 0, _BTN_RIGHT: 0}
+        self._attach_buttons()
+
+        # Azioni per pulsante, in ordine di priorità
+        self._btn_actions = (
+            (_BTN_UP, self._act_up),
+            (_BTN_DOWN, self._act_down),
+            (_BTN_LEFT, self._act_left),
+            (_BTN_RIGHT, self._act_right),
+            (_BTN_FIRE, self._act_fire)
+        )
 
     def _init_tapo(self):
         """Inizializza controller Tapo se abilitato"""
@@ -139,7 +319,8 @@ class ThermoApp:
             tapo_email = self.config.get('tapo.email', '')
             tapo_password = self.config.get('tapo.password', '')
 
-            return TapoP100(tapo_ip, tapo_email, tapo_password)
+            # Timeout breve: una presa irraggiungibile non deve bloccare il loop
+            return TapoP100(tapo_ip, tapo_email, tapo_password, timeout=0.5)
         except Exception as e:
             print(f"Error initializing Tapo: {e}")
             return None
@@ -156,6 +337,8 @@ class ThermoApp:
 
         # Avvia web server se WiFi attivo
         if self.wifi_manager.get_ip():
+            from web_server import WebServer
+            self.web_server = WebServer(self.wifi_manager, self.config, self.sensor, self.app_state)
             self.web_server.start()
             time.sleep(2)  # Mostra IP per 2 secondi
 
@@ -165,136 +348,256 @@ class ThermoApp:
 
         # Avvia loop principale
         self.running = True
-        self.run()
-
-    def run(self):
-        """Loop principale dell'applicazione"""
-        last_display_update = 0
-        last_web_update = 0
+        try:
+            asyncio.run(self.run())
+        except KeyboardInterrupt:
+            print("Interrupted by user")
+        finally:
+            # Stato dello scheduler pulito per la prossima app
+            asyncio.new_event_loop()
+            self.cleanup()
+
+    async def run(self):
+        """Loop principale: task cooperativi per input, sensore, display, termostato e web"""
+        tasks = [
+            self._task_input(),
+            self._task_sensor(),
+            self._task_display(),
+            self._task_thermostat()
+        ]
+        if self.web_server and self.web_server.running:
+            tasks.append(self.web_server.serve())
+
+        await asyncio.gather(*tasks)
+
+    def _sync_config(self):
+        """Aggiorna le copie locali dei valori di config se la configurazione è cambiata"""
+        cfg = self.config
+        if cfg.version == self._cfg_version:
+            return
+        self._cfg_version = cfg.version
+        self._reading_mode = cfg.reading_mode
+        self._refresh_rate = cfg.refresh_rate
+        self._thermostat_active = cfg.thermostat_active
+        self._thermostat_target = cfg.thermostat_target
+        self._laser_enabled = cfg.laser_enabled
+        self._calibration_enabled = cfg.calibration_enabled
+
+    def _task_error(self, e):
+        """Log di un errore in un task (il task prosegue)"""
+        print(f"Error in main loop: {e}")
+        sys.print_exception(e)
+
+    async def _task_input(self):
+        """Pulsanti, laser e garbage collection"""
+        handle_input = self._handle_input
+        update_laser = self._update_laser
+        sync_config = self._sync_config
 
         while self.running:
             try:
-                current_time = time.ticks_ms()
+                sync_config()
+                handle_input()
+                update_laser()
+
+                # Garbage collection periodica o se la memoria scarseggia
+                now = ticks_ms()
+                if ticks_diff(self._gc_due, now) <= 0 or gc.mem_free() < _GC_MIN_FREE:
+                    gc.collect()
+                    self._gc_due = ticks_add(now, _GC_MS)
+            except Exception as e:
+                self._task_error(e)
+                await asyncio.sleep(1)
 
-                # Gestisci richieste web server (non blocca)
-                self.web_server.handle_requests(timeout_ms=5)
+            # Niente lightsleep: sull'ESP32 gli IRQ a fronte non svegliano il chip
+            # e una pressione iniziata durante il sonno andrebbe persa
+            await asyncio.sleep_ms(_INPUT_MS)
 
-                # Gestisci input pulsanti
-                self._handle_input()
+    async def _task_sensor(self):
+        """Letture periodiche in modalità Continue"""
+        sync_config = self._sync_config
 
-                # Aggiorna letture se necessario
-                if self._should_update_reading(current_time):
+        while self.running:
+            try:
+                sync_config()
+                if self._reading_mode == self.READING_CONTINUE:
                     self._read_temperatures()
-                    if self.config.reading_mode == self.READING_CONTINUE and self.buzzer and self.effective_temp is not None:
-                        self.buzzer.note_on(int(self.effective_temp*100))
-                    last_display_update = current_time
+            except Exception as e:
+                self._task_error(e)
+                await asyncio.sleep(1)
+
+            await asyncio.sleep_ms(self._refresh_rate)
 
-                # Aggiorna display
-                if time.ticks_diff(current_time, last_display_update) >= 100:
+    async def _task_display(self):
+        """Refresh del display e dello stato per il web server"""
+        web_due = ticks_ms()
+        sync_config = self._sync_config
+
+        while self.running:
+            try:
+                sync_config()
+                # Durante l'autotune lo schermo è suo
+                if not self._autotuning:
                     self._update_display()
-                    last_display_update = current_time
 
                 # Aggiorna web state periodicamente
-                if time.ticks_diff(current_time, last_web_update) >= 1000:
+                now = ticks_ms()
+                if ticks_diff(web_due, now) <= 0:
                     self._update_web_state()
-                    last_web_update = current_time
+                    web_due = ticks_add(now, _WEB_MS)
+            except Exception as e:
+                self._task_error(e)
+                await asyncio.sleep(1)
 
-                # Gestisci termostato se attivo
-                if self.current_mode == self.MODE_THERMOSTAT and self.config.thermostat_active:
-                    self._handle_thermostat()
+            await asyncio.sleep_ms(_DISPLAY_MS)
 
-                # Gestisci laser
-                self._update_laser()
+    async def _task_thermostat(self):
+        """Termostato PID e servizio della presa Tapo"""
+        sync_config = self._sync_config
 
-                time.sleep_ms(10)
-                gc.collect()
+        while self.running:
+            try:
+                sync_config()
 
-            except KeyboardInterrupt:
-                print("Interrupted by user")
-                break
-            except Exception as e:
-                print(f"Error in main loop: {e}")
-                import sys
-                sys.print_exception(e)
-                time.sleep(1)
+                # Durante l'autotune la presa è pilotata direttamente
+                if self._autotuning:
+                    await asyncio.sleep_ms(_THERMOSTAT_MS)
+                    continue
 
-        self.cleanup()
+                # Gestisci termostato se attivo
+                if self.current_mode == self.MODE_THERMOSTAT and self._thermostat_active:
+                    self._handle_thermostat()
 
-    def _should_update_reading(self, current_time):
-        """Determina se aggiornare la lettura"""
-        reading_mode = self.config.reading_mode
+                # Applica alla presa lo stato richiesto (una volta al secondo)
+                now = ticks_ms()
+                if ticks_diff(self._tapo_due, now) <= 0:
+                    self._service_tapo()
+                    self._tapo_due = ticks_add(now, _TAPO_SERVICE_MS)
 
-        if reading_mode == self.READING_CONTINUE:
-            # Lettura continua con refresh rate
-            refresh = self.config.refresh_rate
-            return time.ticks_diff(current_time, self.last_reading_time) >= refresh
+                # Scrivi su flash solo quando l'utente ha smesso di modificare
+                if self._config_dirty and ticks_diff(now, self._config_edit) > _SAVE_IDLE_MS:
+                    self._save_config()
+            except Exception as e:
+                self._task_error(e)
+                await asyncio.sleep(1)
 
-        # OnShoot: lettura solo quando richiesto (gestito da _handle_input)
-        return False
+            await asyncio.sleep_ms(_THERMOSTAT_MS)
 
+    @micropython.native
     def _handle_input(self):
-        """Gestisce input dai pulsanti"""
-        # UP: cambia modalità o incrementa valore
-        if self._read_button(self.btn_up):
-            if self.editing_target:
-                # Incrementa target temperature
-                target = self.config.thermostat_target + 1
-                target = min(target, 150)
-                self.config.set('thermostat.target', target)
-                self.pid.set_setpoint(target)
-            else:
-                # Cambia modalità
-                self.current_mode = (self.current_mode - 1) % 3
-                self._on_mode_change()
+        """Gestisce input dai pulsanti (una azione per chiamata)"""
+        mask = self._pending
+        if not mask:
+            return
 
-        # DOWN: cambia modalità o decrementa valore
-        elif self._read_button(self.btn_down):
-            if self.editing_target:
-                # Decrementa target temperature
-                target = self.config.thermostat_target - 1
-                target = max(target, 0)
-                self.config.set('thermostat.target', target)
-                self.pid.set_setpoint(target)
-            else:
-                # Cambia modalità
-                self.current_mode = (self.current_mode + 1) % 3
-                self._on_mode_change()
-
-        # LEFT: cambia materiale (emissività) al volo, oppure editing target in Thermostat
-        elif self._read_button(self.btn_left):
-            if self.current_mode == self.MODE_THERMOSTAT and not self.editing_target:
-                # Entra in editing target
-                self.editing_target = True
-            else:
-                # Cambia materiale (cicla tra i preset)
-                self._cycle_emissivity_material()
+        # Durante l'autotune la presa è pilotata dal task: niente cambi di modalità,
+        # setup o materiale (solo FIRE resta attivo)
+        if self._autotuning and mask & ~_BTN_FIRE:
+            self._take_pending(mask & ~_BTN_FIRE)
+            mask &= _BTN_FIRE
+            if not mask:
+                return
+
+        # Debouncing condiviso: le pressioni troppo ravvicinate vengono scartate
+        now = ticks_ms()
+        if ticks_diff(now, self.last_btn_time) < _DEBOUNCE_MS:
+            self._take_pending(mask)
+            return
 
-        # RIGHT: conferma editing o entra in setup
-        elif self._read_button(self.btn_right):
-            if self.editing_target:
-                # Conferma e salva
-                self.config.save()
-                self.editing_target = False
-                self._beep()
-            else:
-                # Entra in setup
-                self._enter_setup()
+        for bit, action in self._btn_actions:
+            if mask & bit:
+                self._take_pending(bit)
+                self.last_btn_time = now
+                # Ogni pressione può cambiare lo schermo: forza il ridisegno
+                self._dirty = True
+                action()
+                return
+
+    def _act_up(self):
+        """UP: cambia modalità o incrementa valore"""
+        if self.editing_target:
+            # Incrementa target temperature
+            target = self.config.thermostat_target + 1
+            target = min(target, 150)
+            self.config.set('thermostat.target', target)
+            self.pid.set_setpoint(target)
+            self._mark_config_dirty()
+        else:
+            # Cambia modalità
+            self._step_mode(-1)
+
+    def _act_down(self):
+        """DOWN: cambia modalità o decrementa valore"""
+        if self.editing_target:
+            # Decrementa target temperature
+            target = self.config.thermostat_target - 1
+            target = max(target, 0)
+            self.config.set('thermostat.target', target)
+            self.pid.set_setpoint(target)
+            self._mark_config_dirty()
+        else:
+            # Cambia modalità
+            self._step_mode(1)
+
+    def _act_left(self):
+        """LEFT: cambia materiale (emissività) al volo, oppure editing target in Thermostat"""
+        if self.current_mode == self.MODE_THERMOSTAT and not self.editing_target:
+            # Entra in editing target
+            self.editing_target = True
+        else:
+            # Cambia materiale (cicla tra i preset)
+            self._cycle_emissivity_material()
 
-        # FIRE: lettura in modalità OnShoot
-        elif self._read_button(self.btn_fire):
-            if self.config.reading_mode == self.READING_ONSHOOT:
-                self._read_temperatures()
-                self._beep()
+    def _act_right(self):
+        """RIGHT: conferma editing o entra in setup"""
+        if self.editing_target:
+            # Conferma: il salvataggio su flash avviene a riposo
+            self._mark_config_dirty()
+            self.editing_target = False
+            self._beep()
+        else:
+            # Entra in setup
+            self._enter_setup()
+
+    def _act_fire(self):
+        """FIRE: lettura in modalità OnShoot"""
+        if self._reading_mode == self.READING_ONSHOOT:
+            self._read_temperatures()
+            self._beep()
+
+    def _mark_config_dirty(self):
+        """Segna la config come modificata: verrà salvata dopo _SAVE_IDLE_MS di inattività"""
+        self._config_dirty = True
+        self._config_edit = ticks_ms()
+
+    def _save_config(self):
+        """Scrive su flash le modifiche in sospeso"""
+        self._config_dirty = False
+        self.config.save()
+
+    def _step_mode(self, step):
+        """Passa alla modalità successiva/precedente tra quelle disponibili"""
+        modes = self._modes
+        self.current_mode = modes[(modes.index(self.current_mode) + step) % len(modes)]
+        self._on_mode_change()
 
     def _on_mode_change(self):
         """Callback quando cambia modalità"""
         # Reset editing
         self.editing_target = False
+        self._dirty = True
 
         # Inizializza Tapo se si entra in modalità Thermostat
         if self.current_mode == self.MODE_THERMOSTAT and self.config.tapo_enabled:
             if not self.tapo:
                 self.tapo = self._init_tapo()
+        elif self.tapo:
+            # Uscita dal termostato: spegni la presa (il nuovo controller non ne
+            # conoscerà lo stato), poi libera controller e modulo
+            self.tapo.turn_off()
+            self.tapo = None
+            self._tapo_desired = None
+            unload('tapo_control')
 
     def _read_temperatures(self):
         """Legge le temperature dal sensore"""
@@ -306,13 +609,58 @@ class ThermoApp:
         self.object_temp = obj_temp
         self.object_temp_raw = obj_temp_raw
         self.ambient_temp = amb_temp
-        self.last_reading_time = time.ticks_ms()
+        self.last_reading_time = ticks_ms()
+
+        temp = self.effective_temp
+
+        # Tono proporzionale alla temperatura in Continue: riprogramma il PWM
+        # solo se la frequenza cambia in modo percepibile
+        if self.buzzer and temp is not None and self._reading_mode == self.READING_CONTINUE:
+            freq = int(temp * 100)
+            if abs(freq - self._last_buzzer_freq) >= 5:
+                self._last_buzzer_freq = freq
+                self.buzzer.note_on(freq)
 
         # Aggiorna storico per grafico con temperatura effettiva
-        if self.effective_temp is not None:
-            self.temp_history.append(self.effective_temp)
-            if len(self.temp_history) > self.max_history:
-                self.temp_history.pop(0)
+        if self.temp_history is not None and temp is not None:
+            self._push_history(temp)
+
+    def _push_history(self, temp):
+        """Aggiunge un campione allo storico mantenendo min/max incrementali"""
+        idx = self._hist_idx
+        v = int(temp * 100)
+        full = self._hist_len == _MAX_HISTORY
+        evicted = self._hist_fp[idx]
+
+        self.temp_history[idx] = temp
+        self._hist_fp[idx] = v
+        self._hist_idx = (idx + 1) & _HIST_MASK
+        if not full:
+            self._hist_len += 1
+
+        if self._hist_len == 1:
+            self._hist_min = self._hist_max = v
+        elif full and (evicted == self._hist_min or evicted == self._hist_max):
+            # Uscito un estremo (raro): ricalcolo rimandato al disegno del grafico
+            self._extrema_dirty = True
+        elif not self._extrema_dirty:
+            if v < self._hist_min:
+                self._hist_min = v
+            if v > self._hist_max:
+                self._hist_max = v
+
+    def _rescan_extrema(self):
+        """Ricalcola min/max dello storico (buffer pieno: tutte le posizioni valide)"""
+        hist = self._hist_fp
+        min_fp = max_fp = hist[0]
+        for v in hist:
+            if v < min_fp:
+                min_fp = v
+            elif v > max_fp:
+                max_fp = v
+        self._hist_min = min_fp
+        self._hist_max = max_fp
+        self._extrema_dirty = False
 
     def _update_web_state(self):
         """Aggiorna stato per web server"""
@@ -321,56 +669,119 @@ class ThermoApp:
         self.app_state['ambient_temp'] = self.ambient_temp
         self.app_state['last_reading'] = self.last_reading_time
 
+    def _frame_key(self, header_text):
+        """Chiavi del frame corrente per regione: (header, contenuto, footer)"""
+        temp = self.effective_temp
+        amb = self.ambient_temp
+        content = (
+            self.current_mode,
+            round(temp, 1) if temp is not None else None,
+            round(amb, 1) if amb is not None else None,
+            self._thermostat_target,
+            self._thermostat_active,
+            self.editing_target,
+            # Il grafico cambia ad ogni nuova lettura anche a temperatura costante
+            self.last_reading_time if self.current_mode == self.MODE_GRAPH else 0,
+            int(self._last_pid_output + 0.5) if self.current_mode == self.MODE_THERMOSTAT else 0
+        )
+        return (header_text, content, (self.current_mode, self.editing_target))
+
     def _update_display(self):
         """Aggiorna il display in base alla modalità corrente"""
-        self.display.fill(0)
-
-        # Header (top 10px)
-        self._draw_header()
-
-        # Contenuto modalità (centrale 44px: da y=10 a y=54)
-        if self.current_mode == self.MODE_READING:
-            self._draw_reading_mode()
-        elif self.current_mode == self.MODE_THERMOSTAT:
-            self._draw_thermostat_mode()
-        elif self.current_mode == self.MODE_GRAPH:
-            self._draw_graph_mode()
-
-        # Footer (bottom 10px: da y=54 a y=64)
-        self._draw_footer()
+        # In modalità grafico ridisegna al più ogni _GRAPH_MS, salvo ridisegno forzato
+        if self.current_mode == self.MODE_GRAPH and not self._dirty:
+            now = ticks_ms()
+            if ticks_diff(self._graph_due, now) > 0:
+                return
+            self._graph_due = ticks_add(now, _GRAPH_MS)
+
+        header_text = self._header_text()
+
+        # Salta fill/ridisegno/show se il frame non è cambiato
+        key = self._frame_key(header_text)
+        last = self._last_frame_key
+        if self._dirty or last is None:
+            header_changed = content_changed = footer_changed = True
+        elif key == last:
+            return
+        else:
+            header_changed = key[0] != last[0]
+            content_changed = key[1] != last[1]
+            footer_changed = key[2] != last[2]
+        self._last_frame_key = key
+        self._dirty = False
+
+        # Ridisegna solo le regioni cambiate, allineate alle pagine SSD1306 (8px)
+        # Header (pagina 0: y 0-7)
+        if header_changed:
+            if header_text != self._header_fb_text:
+                # Rirenderizza solo quando cambia lo stato WiFi
+                self._header_fb.fill(0)
+                self._header_fb.text(header_text, 0, 0, 1)
+                self._header_fb_text = header_text
+            self.display.blit(self._header_fb, 0, 0)
+
+        # Contenuto modalità (pagine 1-6: y 8-55)
+        if content_changed:
+            self.display.fill_rect(0, 8, 128, 48, 0)
+            self._mode_handlers[self.current_mode]()
+
+        # Footer (pagina 7: y 56-63)
+        if footer_changed:
+            self._draw_footer()
+
+        # Trasmetti solo l'intervallo di pagine toccate
+        first_page = 0 if header_changed else (1 if content_changed else 7)
+        last_page = 7 if footer_changed else (6 if content_changed else 0)
+        if first_page == 0 and last_page == 7:
+            self.display.show()
+        else:
+            self.display.show_pages(first_page, last_page)
 
-        self.display.show()
+    def _header_text(self):
+        """Testo dell'header con info WiFi (ricostruito solo se cambia il collegamento)"""
+        state = self.wifi_manager.link_state()
+        if state == self._hdr_state:
+            return self._hdr_text
+        self._hdr_state = state
 
-    def _draw_header(self):
-        """Disegna header con info WiFi"""
         # Ottieni info WiFi
         wifi_status = self.wifi_manager.get_status()
 
         if wifi_status['sta']['connected']:
             # Connesso come STA
             ssid = wifi_status['sta']['ssid'] or '?'
-            text = f"STA:{ssid[:10]}"
+            text = "STA:" + ssid[:10]
         elif wifi_status['ap']['active']:
             # Modalità AP
             ssid = wifi_status['ap']['ssid']
-            text = f"AP:{ssid[:11]}"
+            text = "AP:" + ssid[:11]
         else:
             # Nessuna connessione
             text = "WiFi:Off"
 
-        self.display.text(text, 0, 0, 1)
+        self._hdr_text = text
+        return text
 
     def _draw_footer(self):
-        """Disegna footer con menu"""
-        mode_name = self.MODE_NAMES[self.current_mode]
+        """Disegna footer con menu (striscia pre-renderizzata per modalità)"""
+        key = (self.current_mode, self.editing_target)
+        fb = self._footer_fbs.get(key)
+        if fb is None:
+            mode_name = self.MODE_NAMES[self.current_mode]
 
-        if self.editing_target:
-            # Mostra che si sta editando
-            text = f"{mode_name} *EDIT*"
-        else:
-            text = f"{mode_name} Set>"
+            if self.editing_target:
+                # Mostra che si sta editando
+                text = f"{mode_name} *EDIT*"
+            else:
+                text = f"{mode_name} Set>"
 
-        self.display.text(text, 0, 56, 1)
+            fb = framebuf.FrameBuffer(bytearray(128), 128, 8, framebuf.MONO_VLSB)
+            fb.text(text, 0, 0, 1)
+            self._footer_fbs[key] = fb
+
+        # Il blit copia anche i pixel spenti: nessun fill_rect necessario
+        self.display.blit(fb, 0, 56)
 
     def _draw_reading_mode(self):
         """Disegna modalità Reading"""
@@ -386,114 +797,173 @@ class ThermoApp:
             y_amb = 36
 
             if self.effective_temp is not None:
-                self.display.text(f"Obj: {self.effective_temp:.1f}C", 10, y_obj, 1)
+                self.display.text("Obj:", 10, y_obj, 1)
+                self._draw_temp(self.effective_temp, 50, y_obj)
             else:
                 self.display.text("Obj: --.-C", 10, y_obj, 1)
 
             if self.ambient_temp is not None:
-                self.display.text(f"Amb: {self.ambient_temp:.1f}C", 10, y_amb, 1)
+                self.display.text("Amb:", 10, y_amb, 1)
+                self._draw_temp(self.ambient_temp, 50, y_amb)
             else:
                 self.display.text("Amb: --.-C", 10, y_amb, 1)
 
     def _draw_thermostat_mode(self):
         """Disegna modalità Thermostat"""
-        target = self.config.thermostat_target
-        active = self.config.thermostat_active
+        target = self._thermostat_target
+        active = self._thermostat_active
 
         # Riga 1: temperatura corrente
         y1 = 18
         if self.effective_temp is not None:
-            self.display.text(f"Temp: {self.effective_temp:.1f}C", 5, y1, 1)
+            self.display.text("Temp:", 5, y1, 1)
+            self._draw_temp(self.effective_temp, 53, y1)
         else:
             self.display.text("Temp: --.-C", 5, y1, 1)
 
         # Riga 2: target (evidenziato se in editing)
         y2 = 32
-        if self.editing_target:
-            self.display.text(f">Tgt: {target}C<", 5, y2, 1)
-        else:
-            self.display.text(f"Target: {target}C", 5, y2, 1)
+        key = (target, self.editing_target)
+        if key != self._tgt_key:
+            self._tgt_key = key
+            if self.editing_target:
+                self._tgt_text = ">Tgt: %dC<" % target
+            else:
+                self._tgt_text = "Target: %dC" % target
+        self.display.text(self._tgt_text, 5, y2, 1)
 
         # Riga 3: stato
         y3 = 46
         if active:
             # Mostra output PID
             if self.effective_temp is not None:
-                output = self.pid.update(self.effective_temp)
-                state = "ON" if output > 50 else "OFF"
-                self.display.text(f"PID:{output:.0f}% {state}", 5, y3, 1)
+                # Output calcolato dal task termostato: qui solo lettura
+                output = self._last_pid_output
+                key = (int(output + 0.5), output > 50)
+                if key != self._pid_key:
+                    self._pid_key = key
+                    self._pid_text = "PID:%d%% %s" % (key[0], "ON" if key[1] else "OFF")
+                self.display.text(self._pid_text, 5, y3, 1)
             else:
                 self.display.text("PID: Wait...", 5, y3, 1)
         else:
             self.display.text("Status: OFF", 5, y3, 1)
 
+    @micropython.native
+    def _draw_temp(self, temp, x, y):
+        """Disegna "xx.xC" carattere per carattere con glifi costanti (nessuna stringa nuova)"""
+        text = self.display.text
+        t = int(temp * 10 + (0.5 if temp >= 0 else -0.5))
+        if t < 0:
+            text('-', x, y, 1)
+            x += 8
+            t = -t
+
+        # Parte intera, dalla cifra più significativa
+        whole = t // 10
+        div = 1
+        while div * 10 <= whole:
+            div *= 10
+        while div:
+            text(_DIGITS[whole // div % 10], x, y, 1)
+            x += 8
+            div //= 10
+
+        # Decimale e unità
+        text('.', x, y, 1)
+        text(_DIGITS[t % 10], x + 8, y, 1)
+        text('C', x + 16, y, 1)
+
+    @micropython.native
     def _draw_graph_mode(self):
         """Disegna modalità Graph"""
-        if not self.temp_history:
+        n = self._hist_len
+        if not n:
             self.display.text("No data", 40, 30, 1)
             return
 
-        # Area grafico: y da 10 a 54 (44 pixel altezza)
-        graph_height = 38
-        graph_y_start = 15
-
-        # Trova min/max per scalare
-        min_temp = min(self.temp_history)
-        max_temp = max(self.temp_history)
-        temp_range = max_temp - min_temp if max_temp > min_temp else 1
-
-        # Disegna grafico
-        for i in range(1, len(self.temp_history)):
-            x1 = i - 1
-            x2 = i
-
-            # Scala temperature in pixel (inverti Y perché 0 è in alto)
-            y1 = graph_y_start + graph_height - int(((self.temp_history[i-1] - min_temp) / temp_range) * graph_height)
-            y2 = graph_y_start + graph_height - int(((self.temp_history[i] - min_temp) / temp_range) * graph_height)
-
-            # Limita y
-            y1 = max(graph_y_start, min(y1, graph_y_start + graph_height - 1))
-            y2 = max(graph_y_start, min(y2, graph_y_start + graph_height - 1))
-
-            # Disegna linea
-            self.display.line(x1, y1, x2, y2, 1)
+        hist = self._hist_fp
+        # Indice del campione più vecchio nel buffer circolare
+        start = (self._hist_idx - n) & _HIST_MASK
+
+        # Min/max mantenuti incrementalmente da _push_history
+        if self._extrema_dirty:
+            self._rescan_extrema()
+        min_fp = self._hist_min
+        max_fp = self._hist_max
+
+        # Fattore di scala Q16 calcolato una volta: viper non ha divisione float
+        params = self._graph_params
+        params[0] = start
+        params[1] = min_fp
+        params[2] = (_GRAPH_HEIGHT << 16) // (max_fp - min_fp if max_fp > min_fp else 1)
+
+        ys = self._graph_y
+        _scale_history(hist, ys, params, n)
+
+        # Disegna grafico (inverti Y perché 0 è in alto)
+        # Colonne adiacenti: ogni segmento è una barra verticale da y1 a y2
+        vline = self.display.vline
+        y1 = ys[0]
+        self.display.pixel(0, y1, 1)
+        for i in range(1, n):
+            y2 = ys[i]
+            if y2 >= y1:
+                vline(i, y1, y2 - y1 + 1, 1)
+            else:
+                vline(i, y2, y1 - y2 + 1, 1)
+            y1 = y2
 
         # Mostra scala
-        self.display.text(f"{max_temp:.0f}", 0, 10, 1)
-        self.display.text(f"{min_temp:.0f}", 0, 48, 1)
+        self.display.text(f"{max_fp / 100:.0f}", 0, 10, 1)
+        self.display.text(f"{min_fp / 100:.0f}", 0, 48, 1)
 
     def _handle_thermostat(self):
         """Gestisce logica termostato con PID"""
-        if not self.effective_temp or not self.tapo:
+        if self.effective_temp is None:
             return
 
-        # Aggiorna PID con temperatura effettiva
+        # Aggiorna PID con temperatura effettiva (unico punto di calcolo)
         output = self.pid.update(self.effective_temp)
+        self._last_pid_output = output
+        if not self.tapo:
+            return
 
         # Controllo on/off semplice basato su output PID
         # Se output > 50% accendi, altrimenti spegni
+        # Qui si registra solo lo stato desiderato, con intervallo minimo tra commutazioni
+        desired = output > 50
+        if desired != self._tapo_desired:
+            now = ticks_ms()
+            if (self._tapo_desired is None
+                    or ticks_diff(now, self._tapo_changed) >= _TAPO_MIN_INTERVAL_MS):
+                self._tapo_desired = desired
+                self._tapo_changed = now
+
+    def _service_tapo(self):
+        """Invia alla presa Tapo lo stato desiderato se diverso da quello attuale"""
+        desired = self._tapo_desired
+        if desired is None or not self.tapo or self.tapo.is_on == desired:
+            return
+
+        # Se la richiesta fallisce lo stato non cambia e si riprova al giro successivo
         try:
-            if output > 50:
-                if not self.tapo.is_on:
-                    self.tapo.turn_on()
+            if desired:
+                self.tapo.turn_on()
             else:
-                if self.tapo.is_on:
-                    self.tapo.turn_off()
+                self.tapo.turn_off()
         except Exception as e:
             print(f"Error controlling Tapo: {e}")
 
+    @micropython.native
     def _update_laser(self):
         """Aggiorna stato laser"""
-        if not self.config.laser_enabled:
+        if not self._laser_enabled:
             self.laser.value(0)
             return
 
-        # Laser on in modalità Continue
-        if self.config.reading_mode == self.READING_CONTINUE:
-            self.laser.value(1)
-        else:
-            # Laser on quando FIRE premuto in OnShoot
-            self.laser.value(1 if self.btn_fire.value() == 0 else 0)
+        laser_mode = self._LASER_MODE.get(self._reading_mode, self._LASER_MODE[self.READING_ONSHOOT])
+        self.laser.value(laser_mode(self))
 
     def _show_splash(self):
         """Mostra schermata iniziale"""
@@ -516,17 +986,33 @@ class ThermoApp:
                 self.buzzer.beep(1000,50,75)
             except:
                 pass
+            # Il beep lascia il PWM a duty 0: il tono Continue va riacceso
+            self._last_buzzer_freq = -1
 
-    def _read_button(self, btn):
-        """Legge pulsante con debouncing"""
-        now = time.ticks_ms()
-        if time.ticks_diff(now, self.last_btn_time) < self.debounce_ms:
-            return False
-
-        if btn.value() == 0:  # Premuto (pull-up)
-            self.last_btn_time = now
-            return True
-        return False
+    def _btn_isr(self, pin):
+        """Handler IRQ dei pulsanti: ignora i rimbalzi entro il periodo di rilassamento"""
+        bit = self._btn_bits.get(pin)
+        if bit is None:
+            return
+        now = ticks_ms()
+        if ticks_diff(now, self._last_irq[bit]) > _RELAX_MS:
+            self._last_irq[bit] = now
+            self._pending |= bit
+
+    def _attach_buttons(self):
+        """Collega gli IRQ dei pulsanti all'handler dell'app"""
+        for btn in self._btn_bits:
+            btn.irq(trigger=Pin.IRQ_FALLING, handler=self._btn_isr)
+
+    def _take_pending(self, bits):
+        """Consuma i bit indicati della maschera (IRQ sospesi durante la modifica)"""
+        state = disable_irq()
+        self._pending &= ~bits
+        enable_irq(state)
+
+    def _clear_pending(self):
+        """Scarta tutte le pressioni in attesa"""
+        self._pending = 0
 
     def _cycle_emissivity_material(self):
         """Cicla tra i preset di materiali per emissività"""
@@ -567,48 +1053,94 @@ class ThermoApp:
 
         # Spegni laser e buzzer
         self.laser.value(0)
-        #if self.buzzer:
-            #self.buzzer.value(0)
+        if self.buzzer:
+            self.buzzer.note_off()
+            self._last_buzzer_freq = -1
 
         # Ferma web server temporaneamente (mantiene WiFi)
         # Non serve cleanup completo, solo pausa
 
+        # Scrivi le modifiche in sospeso: al ritorno il config viene riletto dal file
+        if self._config_dirty:
+            self._save_config()
+
         # Importa e avvia setup passando callback per autotune
-        import sys
         import setup
 
         # Crea callback per autotune che chiama il metodo dell'app
-        autotune_callback = lambda: self.autotune_pid()
+        # L'autotune parte come task al ritorno nel loop asyncio
+        autotune_callback = self._start_autotune
 
-        setup.main(self.display, autotune_callback)
+        # Stessa SetupApp del boot: col bus I2C del sensore la calibrazione è disponibile
+        setup.main(self.display, self.i2c, autotune_callback=autotune_callback)
 
         # Cleanup modulo setup
-        del sys.modules['setup']
         del setup
-        gc.collect()
+        unload('setup')
 
         # Ricarica configurazione (potrebbe essere stata modificata)
         self.config.reload()
 
         # Ricarica parametri PID
-        self.pid.set_tunings(
-            self.config.thermostat_p,
-            self.config.thermostat_i,
-            self.config.thermostat_d
-        )
-        self.pid.set_setpoint(self.config.thermostat_target)
+        if self.pid:
+            self.pid.set_tunings(
+                self.config.thermostat_p,
+                self.config.thermostat_i,
+                self.config.thermostat_d
+            )
+            self.pid.set_setpoint(self.config.thermostat_target)
+
+        # Il menu del setup usa gli stessi pin con i propri IRQ: ricollega i nostri
+        # e scarta le pressioni registrate mentre il setup era attivo
+        self._attach_buttons()
+        self._clear_pending()
 
         print("Returned from setup mode")
 
-    def autotune_pid(self):
+    async def _wait_until(self, pred, timeout_s=None, period_ms=1000):
+        """
+        Attende (senza bloccare gli altri task) che pred() sia vero
+
+        Returns:
+            True se la condizione si è verificata, False se scaduto il timeout
+        """
+        start = ticks_ms()
+        while not pred():
+            if timeout_s is not None and ticks_diff(ticks_ms(), start) >= timeout_s * 1000:
+                return False
+            await asyncio.sleep_ms(period_ms)
+        return True
+
+    def _start_autotune(self):
+        """Avvia l'autotune come task asyncio (chiamato dal setup)"""
+        if not self._autotuning:
+            asyncio.create_task(self.autotune_pid())
+
+    async def autotune_pid(self):
         """
         Auto-tune PID con focus su NON superare mai il target
         Misura l'inerzia termica e calcola parametri conservativi
+        Gira come task: web server e pulsanti restano attivi
         """
-        if not self.sensor or not self.tapo:
+        if not self.sensor or not self.tapo or not self.pid:
             print("Autotune failed: sensor or Tapo not available")
             return False
 
+        # Termostato e refresh display sospesi: l'autotune pilota presa e schermo.
+        # Riferimento locale alla presa: resta valido anche se self.tapo cambia
+        tapo = self.tapo
+        self._autotuning = True
+        try:
+            return await self._autotune_run(tapo)
+        finally:
+            # In ogni caso (errore, task cancellato) il riscaldamento resta spento
+            tapo.turn_off()
+            self._autotuning = False
+            self._dirty = True
+
+    async def _autotune_run(self, tapo):
+        """Fasi dell'autotune (vedi autotune_pid)"""
+
         target = self.config.thermostat_target
         print(f"Starting PID autotune for target: {target}C")
 
@@ -627,14 +1159,14 @@ class ThermoApp:
         test_point = max(target * 0.7, target - 20)
 
         # Accendi riscaldamento
-        self.tapo.turn_on()
+        tapo.turn_on()
         start_temp = self.sensor.read_object_temp()
 
         # Riscalda fino al test point
-        while True:
+        def heated():
             temp = self.sensor.read_object_temp()
             if temp is None:
-                continue
+                return False
 
             self.display.fill(0)
             self.display.text("Heating...", 30, 15, 1)
@@ -642,15 +1174,14 @@ class ThermoApp:
             self.display.text(f"-> {test_point:.0f}C", 30, 45, 1)
             self.display.show()
 
-            if temp >= test_point:
-                break
+            return temp >= test_point
 
-            time.sleep(1)
+        await self._wait_until(heated)
 
         # Spegni e misura overshoot
-        self.tapo.turn_off()
+        tapo.turn_off()
         temp_at_shutoff = self.sensor.read_object_temp()
-        time.sleep(2)  # Attendi stabilizzazione lettura
+        await asyncio.sleep(2)  # Attendi stabilizzazione lettura
 
         max_temp = temp_at_shutoff
         overshoot_time = 0
@@ -660,6 +1191,7 @@ class ThermoApp:
         for i in range(60):
             temp = self.sensor.read_object_temp()
             if temp is None:
+                await asyncio.sleep(1)
                 continue
 
             if temp > max_temp:
@@ -672,7 +1204,7 @@ class ThermoApp:
             self.display.text(f"Time: {i}s", 30, 45, 1)
             self.display.show()
 
-            time.sleep(1)
+            await asyncio.sleep(1)
 
         overshoot = max_temp - temp_at_shutoff
         print(f"Overshoot: {overshoot:.1f}C in {overshoot_time}s")
@@ -687,19 +1219,15 @@ class ThermoApp:
 
         # Aspetta che scenda di almeno 10C
         temp_start_cooling = max_temp
-        time_start = time.ticks_ms()
+        time_start = ticks_ms()
 
-        while True:
+        def cooled():
             temp = self.sensor.read_object_temp()
-            if temp is None:
-                continue
-
-            if temp <= temp_start_cooling - 10:
-                break
+            return temp is not None and temp <= temp_start_cooling - 10
 
-            time.sleep(1)
+        await self._wait_until(cooled)
 
-        time_elapsed = time.ticks_diff(time.ticks_ms(), time_start) / 1000.0
+        time_elapsed = ticks_diff(ticks_ms(), time_start) / 1000.0
         cooling_rate = 10.0 / time_elapsed  # °C per secondo
 
         print(f"Cooling rate: {cooling_rate:.3f} C/s")
@@ -759,11 +1287,11 @@ class ThermoApp:
         self.pid.reset()
 
         # Aspetta che la temperatura scenda sotto target - 15C
-        while True:
+        def below_start():
             temp = self.sensor.read_object_temp()
-            if temp and temp < target - 15:
-                break
-            time.sleep(2)
+            return temp and temp < target - 15
+
+        await self._wait_until(below_start, period_ms=2000)
 
         # Test di avvicinamento al target con PID
         test_duration = 300  # 5 minuti max
@@ -773,6 +1301,7 @@ class ThermoApp:
         for i in range(test_duration):
             temp = self.sensor.read_object_temp()
             if temp is None:
+                await asyncio.sleep(1)
                 continue
 
             # Aggiorna PID
@@ -780,11 +1309,11 @@ class ThermoApp:
 
             # Controllo conservativo: spegni se vicino al target
             if temp >= target - safety_margin:
-                self.tapo.turn_off()
+                tapo.turn_off()
             elif output > 50:
-                self.tapo.turn_on()
+                tapo.turn_on()
             else:
-                self.tapo.turn_off()
+                tapo.turn_off()
 
             if temp > max_reached:
                 max_reached = temp
@@ -804,10 +1333,10 @@ class ThermoApp:
                 if abs(temp - target) < 1.0:
                     break
 
-            time.sleep(1)
+            await asyncio.sleep(1)
 
         # Spegni
-        self.tapo.turn_off()
+        tapo.turn_off()
 
         # Valuta risultato
         success = max_reached <= target + 1.0  # Tolleranza 1C
@@ -825,7 +1354,7 @@ class ThermoApp:
             print(f"Autotune warning: reached {max_reached:.1f}C")
 
         self.display.show()
-        time.sleep(5)
+        await asyncio.sleep(5)
 
         return success
 
@@ -835,13 +1364,22 @@ class ThermoApp:
 
         self.running = False
 
+        # Non perdere modifiche non ancora salvate
+        if self._config_dirty:
+            self._save_config()
+
         # Spegni laser
         if self.laser:
             self.laser.value(0)
 
+        # Disattiva IRQ pulsanti
+        for btn in self._btn_bits:
+            btn.irq(handler=None)
+
         # Spegni buzzer
-        #if self.buzzer:
-            #self.buzzer.value(0)
+        if self.buzzer:
+            self.buzzer.close()
+            self._last_buzzer_freq = -1
 
         # Ferma web server
         if self.web_server:
@@ -1,5 +1,12 @@
 from machine import Pin, PWM
 import time
+from time import sleep_ms
+import array
+
+_log = print  # Log degli errori: argomenti separati, nessuna f-string
+
+# Duty cycle (0-1023) per ogni volume percentuale 0-100, calcolato una volta
+_DUTY_LUT = array.array('H', [(v * 1023) // 100 for v in range(101)])
 
 def beep(pin_num, frequency, duration_ms):
     """
@@ -21,14 +28,14 @@ def beep(pin_num, frequency, duration_ms):
         buzzer.duty(512)
         
         # Aspetta per la durata specificata
-        time.sleep_ms(duration_ms)
+        sleep_ms(duration_ms)
         
         # Ferma il PWM
         buzzer.duty(0)
         buzzer.deinit()
         
     except Exception as e:
-        print(f"Errore beep: {e}")
+        _log('Errore beep:', e)
 
 # Versione con controllo volume
 def beep_volume(pin_num, frequency, duration_ms, volume=50):
@@ -46,16 +53,16 @@ def beep_volume(pin_num, frequency, duration_ms, volume=50):
         buzzer.freq(frequency)
         
         # Converti volume percentuale in duty cycle (0-1023)
-        duty = int((volume / 100) * 1023)
+        duty = _DUTY_LUT[min(100, max(0, int(volume)))]
         buzzer.duty(duty)
         
-        time.sleep_ms(duration_ms)
+        sleep_ms(duration_ms)
         
         buzzer.duty(0)
         buzzer.deinit()
         
     except Exception as e:
-        print(f"Errore beep: {e}")
+        _log('Errore beep:', e)
         
 
 # Classe Buzzer per uso più avanzato
@@ -63,15 +70,30 @@ class Buzzer:
     def __init__(self, pin_num):
         self.pin_num = pin_num
         self.pwm = None
-    
+        self._freq = 0
+
+    def _ensure_pwm(self, frequency):
+        """Crea il PWM una sola volta e cambia la frequenza solo se serve"""
+        if self.pwm is None:
+            self.pwm = PWM(Pin(self.pin_num), duty=0)
+        if self._freq != frequency:
+            self.pwm.freq(frequency)
+            self._freq = frequency
+
     def beep(self, frequency=1000, duration_ms=100, volume=50):
-        """Singolo beep"""
-        beep_volume(self.pin_num, frequency, duration_ms, volume)
+        """Singolo beep (riusa il PWM persistente)"""
+        try:
+            self._ensure_pwm(frequency)
+            self.pwm.duty(_DUTY_LUT[min(100, max(0, int(volume)))])
+            sleep_ms(duration_ms)
+            self.pwm.duty(0)
+        except Exception as e:
+            _log('Errore beep:', e)
     
     def double_beep(self, frequency=1000, duration_ms=100, pause_ms=100):
         """Doppio beep"""
         self.beep(frequency, duration_ms)
-        time.sleep_ms(pause_ms)
+        sleep_ms(pause_ms)
         self.beep(frequency, duration_ms)
     
     def success(self):
@@ -90,7 +112,7 @@ class Buzzer:
         """Allarme ripetuto"""
         for _ in range(times):
             self.beep(1500, 200)
-            time.sleep_ms(100)
+            sleep_ms(100)
     
     def click(self):
         """Suono click per feedback pulsanti"""
@@ -101,32 +123,52 @@ class Buzzer:
         Suona una melodia
         notes: lista di tuple (frequenza, durata_ms)
         """
-        for freq, duration in notes:
-            if freq == 0:  # Pausa
-                time.sleep_ms(duration)
-            else:
-                self.beep(freq, duration)
-            time.sleep_ms(10)  # Piccola pausa tra note
-            
+        sleep = sleep_ms
+        duty = _DUTY_LUT[50]
+        try:
+            self._ensure_pwm(1000)
+            pwm = self.pwm
+            for n in notes:
+                freq = n[0]
+                if freq:
+                    if self._freq != freq:
+                        pwm.freq(freq)
+                        self._freq = freq
+                    pwm.duty(duty)
+                    sleep(n[1])
+                    pwm.duty(0)
+                else:  # Pausa
+                    sleep(n[1])
+                sleep(10)  # Piccola pausa tra note
+        except Exception as e:
+            _log('Errore beep:', e)
+
     def note_on(self, frequency, volume=50):
         try:
-            self.pwm = PWM(Pin(self.pin_num))
-            self.pwm.freq(frequency)
+            self._ensure_pwm(frequency)
             
             # Converti volume percentuale in duty cycle (0-1023)
-            duty = int((volume / 100) * 1023)
+            duty = _DUTY_LUT[min(100, max(0, int(volume)))]
             self.pwm.duty(duty)
             
         except Exception as e:
-            print(f"Errore beep: {e}")
+            _log('Errore beep:', e)
         
     def note_off(self):
         try:
-            self.pwm.duty(0)
-            self.pwm.deinit()
+            if self.pwm:
+                self.pwm.duty(0)
             
         except Exception as e:
-            print(f"Errore beep: {e}")
+            _log('Errore beep:', e)
+
+    def close(self):
+        """Spegne e rilascia il PWM"""
+        if self.pwm:
+            self.pwm.duty(0)
+            self.pwm.deinit()
+            self.pwm = None
+            self._freq = 0
 
 # Esempi di utilizzo
 if __name__ == "__main__":
@@ -2,121 +2,162 @@
 Classe condivisa per gestione configurazione
 Legge e scrive il file config.json e fornisce accesso ai valori
 """
-import json
+try:
+    import ujson as json
+except ImportError:
+    import json
 import gc
 
+_log = print  # Log degli errori: argomenti separati, nessuna f-string
+
+# PIN e preferenze letti spesso e modificati di rado: copiati in attributi
+# (nome, path, default), aggiornati da load()/replace()/set(). Le preferenze
+# vanno in slot privati letti dalle property, i cui setter passano da set()
+_MATERIALIZED = (
+    ('PIN_SDA', 'pins.PIN_SDA', 5),
+    ('PIN_SCL', 'pins.PIN_SCL', 6),
+    ('PIN_LEFT', 'pins.PIN_LEFT', 3),
+    ('PIN_RIGHT', 'pins.PIN_RIGHT', 4),
+    ('PIN_FIRE', 'pins.PIN_FIRE', 0),
+    ('PIN_LASER', 'pins.PIN_LASER', 9),
+    ('PIN_UP', 'pins.PIN_UP', 10),
+    ('PIN_DOWN', 'pins.PIN_DOWN', 7),
+    ('PIN_BUZZER', 'pins.PIN_BUZZER', 1),
+    ('PIN_SDA_DISP', 'pins.PIN_SDA_DISP', None),  # Bus OLED separato (opzionale)
+    ('PIN_SCL_DISP', 'pins.PIN_SCL_DISP', None),
+    ('_laser_enabled', 'preferences.laser', True),
+    ('_bignum_enabled', 'preferences.bignum', False),
+    ('_reading_mode', 'preferences.reading', 'OnShoot'),
+    ('_refresh_rate', 'preferences.refresh', 500),
+)
+
 class Config:
     """Gestione configurazione del sistema"""
 
     _instance = None
+    _initialized = False  # Default di classe: nessuna scrittura in __new__
     _config_file = 'config.json'
 
     def __new__(cls):
         """Singleton pattern per avere una sola istanza"""
-        if cls._instance is None:
-            cls._instance = super(Config, cls).__new__(cls)
-            cls._instance._initialized = False
-        return cls._instance
+        instance = cls._instance
+        if instance is None:
+            instance = cls._instance = super(Config, cls).__new__(cls)
+        return instance
 
     def __init__(self):
         """Inizializza e carica la configurazione"""
         if self._initialized:
             return
         self._data = {}
+        self._flat = {}  # Path puntato -> valore, per get() in O(1)
+        self._dirty = False  # Modifiche in memoria non ancora scritte su file
+        self.version = 0  # Incrementato ad ogni modifica: chi fa cache dei valori lo confronta
         self.load()
         self._initialized = True
 
     def load(self):
         """Carica la configurazione dal file JSON"""
+        self.version += 1
         try:
-            with open(self._config_file, 'r') as f:
-                self._data = json.load(f)
+            # Lettura in binario e parsing in un colpo solo
+            with open(self._config_file, 'rb') as f:
+                self._data = json.loads(f.read())
+            gc.collect()  # Libera il buffer transitorio del file
             print("Config loaded successfully")
         except Exception as e:
-            print(f"Error loading config: {e}")
+            _log('Error loading config:', e)
             # Configurazione di default se il file non esiste
             self._data = self._get_default_config()
-
-    def save(self):
-        """Salva la configurazione sul file JSON"""
+        self._dirty = False
+        self._flat = {}
+        self._flatten(self._data)
+        self._materialize()
+
+    def _materialize(self):
+        """Copia PIN e preferenze in attributi (modificarli sempre con set())"""
+        get = self._flat.get
+        for name, path, default in _MATERIALIZED:
+            setattr(self, name, get(path, default))
+
+    def _flatten(self, d, prefix=''):
+        """Indicizza ogni nodo di d (sezioni e foglie) per path puntato"""
+        flat = self._flat
+        for k, v in d.items():
+            path = prefix + k
+            flat[path] = v
+            if isinstance(v, dict):
+                self._flatten(v, path + '.')
+
+    def replace(self, data):
+        """Sostituisce l'intera configurazione (es. da web) senza salvarla"""
+        self.version += 1
+        self._dirty = True
+        self._data = data
+        self._flat = {}
+        self._flatten(data)
+        self._materialize()
+
+    def save(self, force=False):
+        """Salva la configurazione sul file JSON (solo se modificata, salvo force)"""
+        if not (self._dirty or force):
+            return True
+        self.version += 1
         try:
             with open(self._config_file, 'w') as f:
                 json.dump(self._data, f)
+            self._dirty = False
             print("Config saved successfully")
             return True
         except Exception as e:
-            print(f"Error saving config: {e}")
+            _log('Error saving config:', e)
             return False
 
+    def flush(self):
+        """Scrive le modifiche in sospeso (alias di save)"""
+        return self.save()
+
     def get(self, path, default=None):
         """
         Ottiene un valore dalla configurazione usando un path separato da punti
         Es: get('wifi.mode') ritorna il valore di _data['wifi']['mode']
         """
-        keys = path.split('.')
-        value = self._data
-        try:
-            for key in keys:
-                value = value[key]
-            return value
-        except (KeyError, TypeError):
-            return default
+        return self._flat.get(path, default)
 
     def set(self, path, value):
         """
         Imposta un valore nella configurazione usando un path separato da punti
         Es: set('wifi.mode', 'STA') imposta _data['wifi']['mode'] = 'STA'
         """
+        self.version += 1
+        self._dirty = True
         keys = path.split('.')
+        leaf = keys.pop()
         data = self._data
+        flat = self._flat
         try:
-            for key in keys[:-1]:
-                if key not in data:
-                    data[key] = {}
-                data = data[key]
-            data[keys[-1]] = value
+            for key in keys:
+                data = data.setdefault(key, {})
+            data[leaf] = value
+            if keys and path[:-len(leaf) - 1] not in flat:
+                # Create sezioni nuove: reindicizza tutto (caso raro)
+                self._flat = {}
+                self._flatten(self._data)
+            else:
+                flat[path] = value
+                if isinstance(value, dict):
+                    # Sezione sostituita: rimuovi le vecchie chiavi figlie
+                    sub = path + '.'
+                    for k in [k for k in flat if k.startswith(sub)]:
+                        del flat[k]
+                    self._flatten(value, sub)
+            if (keys[0] if keys else leaf) in ('pins', 'preferences'):
+                self._materialize()
             return True
         except Exception as e:
-            print(f"Error setting config value: {e}")
+            _log('Error setting config value:', e)
             return False
 
-    # Accesso diretto ai PIN come costanti
-    @property
-    def PIN_SDA(self):
-        return self.get('pins.PIN_SDA', 5)
-
-    @property
-    def PIN_SCL(self):
-        return self.get('pins.PIN_SCL', 6)
-
-    @property
-    def PIN_LEFT(self):
-        return self.get('pins.PIN_LEFT', 3)
-
-    @property
-    def PIN_RIGHT(self):
-        return self.get('pins.PIN_RIGHT', 4)
-
-    @property
-    def PIN_FIRE(self):
-        return self.get('pins.PIN_FIRE', 0)
-
-    @property
-    def PIN_LASER(self):
-        return self.get('pins.PIN_LASER', 9)
-
-    @property
-    def PIN_UP(self):
-        return self.get('pins.PIN_UP', 10)
-
-    @property
-    def PIN_DOWN(self):
-        return self.get('pins.PIN_DOWN', 7)
-
-    @property
-    def PIN_BUZZER(self):
-        return self.get('pins.PIN_BUZZER', 1)
-
     # Accesso a wifi
     @property
     def wifi_mode(self):
@@ -138,10 +179,10 @@ class Config:
     def wifi_selected(self, value):
         self.set('wifi.selected', value)
 
-    # Accesso a preferences
+    # Accesso a preferences (valori copiati negli slot da _materialize)
     @property
     def laser_enabled(self):
-        return self.get('preferences.laser', True)
+        return self._laser_enabled
 
     @laser_enabled.setter
     def laser_enabled(self, value):
@@ -149,7 +190,7 @@ class Config:
 
     @property
     def bignum_enabled(self):
-        return self.get('preferences.bignum', False)
+        return self._bignum_enabled
 
     @bignum_enabled.setter
     def bignum_enabled(self, value):
@@ -157,7 +198,7 @@ class Config:
 
     @property
     def reading_mode(self):
-        return self.get('preferences.reading', 'OnShoot')
+        return self._reading_mode
 
     @reading_mode.setter
     def reading_mode(self, value):
@@ -165,12 +206,29 @@ class Config:
 
     @property
     def refresh_rate(self):
-        return self.get('preferences.refresh', 500)
+        return self._refresh_rate
 
     @refresh_rate.setter
     def refresh_rate(self, value):
         self.set('preferences.refresh', value)
 
+    # Funzioni opzionali della build (se disattivate non vengono importate)
+    @property
+    def thermostat_enabled(self):
+        return self.get('features.thermostat', True)
+
+    @thermostat_enabled.setter
+    def thermostat_enabled(self, value):
+        self.set('features.thermostat', value)
+
+    @property
+    def graph_enabled(self):
+        return self.get('features.graph', True)
+
+    @graph_enabled.setter
+    def graph_enabled(self, value):
+        self.set('features.graph', value)
+
     # Accesso a thermostat
     @property
     def thermostat_active(self):
@@ -357,6 +415,10 @@ class Config:
                 "reading": "OnShoot",
                 "refresh": 500
             },
+            "features": {
+                "thermostat": True,
+                "graph": True
+            },
             "thermostat": {
                 "active": False,
                 "target": 50,
@@ -3,8 +3,14 @@ Driver per sensore di temperatura a infrarossi MLX90614
 Supporta lettura temperatura oggetto e ambiente via I2C
 """
 import time
+import struct
 from micropython import const
 
+# Stampe di debug nel percorso di lettura (0: il compilatore elimina i rami)
+DEBUG = const(0)
+
+_log = print  # Log degli errori: argomenti separati, nessuna f-string
+
 # Indirizzi registri MLX90614
 MLX90614_I2C_ADDR = const(0x5A)
 MLX90614_TA = const(0x06)  # Ambient temperature
@@ -14,6 +20,27 @@ MLX90614_TOBJ1 = const(0x07)  # Object temperature
 MLX90614_EEPROM_EMISSIVITY = const(0x24)  # Registro emissività (EEPROM)
 MLX90614_EEPROM_CONFIG = const(0x25)  # Config register
 
+# Conversione raw -> °C senza calibrazione: 0.02K per LSB, 0x0000 = -273.15°C
+_RAW_A = 0.02
+_RAW_B = -273.15
+
+# Parola a 16 bit little-endian
+_U16 = '<H'
+
+
+def _crc8_entry(crc):
+    """Otto passi del CRC-8 (polinomio 0x07) per un singolo byte"""
+    for _ in range(8):
+        if crc & 0x80:
+            crc = (crc << 1) ^ 0x07
+        else:
+            crc = crc << 1
+    return crc & 0xFF
+
+
+# Tabella CRC-8 calcolata una volta all'import
+_CRC8_TABLE = bytes(_crc8_entry(i) for i in range(256))
+
 
 class MLX90614:
     """Driver per sensore MLX90614"""
@@ -30,6 +57,10 @@ class MLX90614:
         self.i2c = i2c
         self.addr = addr
         self._buf = bytearray(3)
+        self._err_count = 0  # Letture I2C fallite consecutive
+        # Buffer riusati per la scrittura EEPROM: pacchetto (dati + PEC) e input CRC
+        self._tx_buf = bytearray(3)
+        self._crc_buf = bytearray(4)
         self.config = config
 
         # Calcola coefficienti di calibrazione lineare
@@ -37,11 +68,23 @@ class MLX90614:
         self._cal_m = 1.0  # coefficiente angolare
         self._cal_q = 0.0  # intercetta
 
+        # Coefficienti fusi raw -> °C calibrati: temp = raw * _A + _B
+        self._A = _RAW_A
+        self._B = _RAW_B
+
         if config and config.calibration_enabled:
             self._calculate_calibration()
 
-        # Verifica che il sensore sia presente
-        if addr not in i2c.scan():
+        # Senza calibrazione la lettura calibrata coincide con la raw:
+        # specializza read_all una volta sola invece di convertire due volte
+        if not self._cal_enabled:
+            self.read_all = self._read_all_uncalibrated
+
+        # Verifica che il sensore sia presente leggendo direttamente TA
+        # (evita la scansione di tutto il bus)
+        try:
+            i2c.readfrom_mem_into(addr, MLX90614_TA, self._buf)
+        except OSError:
             raise OSError(f"MLX90614 not found at address {hex(addr)}")
 
         print(f"MLX90614 initialized at {hex(addr)}")
@@ -73,48 +116,78 @@ class MLX90614:
             self._cal_q = y1 - self._cal_m * x1
             self._cal_enabled = True
 
+            # m * (raw * 0.02 - 273.15) + q in un'unica moltiplicazione
+            self._A = self._cal_m * _RAW_A
+            self._B = self._cal_q + self._cal_m * _RAW_B
+
         except Exception as e:
             print(f"Error calculating calibration: {e}")
             self._cal_enabled = False
 
-    def _read_temp(self, register):
+    def _read_raw(self, register):
         """
-        Legge la temperatura da un registro
+        Legge la parola grezza di un registro
 
         Args:
             register: registro da leggere (TA o TOBJ1)
 
         Returns:
-            Temperatura in gradi Celsius
+            Valore a 16 bit (0.02K per LSB) o None se errore
         """
+        # Leggi 3 bytes (2 dati + 1 PEC): solo l'I2C può fallire
         try:
-            # Leggi 3 bytes (2 dati + 1 PEC)
             self.i2c.readfrom_mem_into(self.addr, register, self._buf)
+        except OSError as e:
+            # Conta gli errori consecutivi e segnala il primo di ogni serie
+            self._err_count += 1
+            if self._err_count == 1 or DEBUG:
+                _log('Error reading temperature:', e)
+            return None
+
+        # Lettura riuscita: il prossimo errore apre una nuova serie (e viene segnalato)
+        self._err_count = 0
+
+        # I dati sono in formato little-endian
+        return struct.unpack_from(_U16, self._buf)[0]
+
+    def _to_celsius(self, temp_raw, a=_RAW_A, b=_RAW_B):
+        """
+        Converte una parola grezza in gradi Celsius
 
-            # Converti in temperatura
-            # I dati sono in formato little-endian
-            temp_raw = (self._buf[1] << 8) | self._buf[0]
+        Args:
+            temp_raw: valore letto da _read_raw (o None)
+            a, b: coefficienti della conversione lineare raw -> °C
 
-            # Converti in Celsius
-            # Il valore è in 0.02K per LSB, 0x0000 = -273.15°C
-            temp_k = temp_raw * 0.02
-            temp_c = temp_k - 273.15
+        Returns:
+            Temperatura in °C arrotondata al decimo, o None
+        """
+        if temp_raw is None:
+            return None
 
-            # Debug: stampa temperatura prima della calibrazione
-            print(f"Raw temp: {temp_c:.1f}°C")
+        # Conversione in Celsius e calibrazione in un solo passo
+        temp_c = temp_raw * a + b
 
-            # Applica calibrazione lineare se abilitata
-            if self._cal_enabled:
-                temp_c = self._cal_m * temp_c + self._cal_q
+        # Debug: stampa temperatura prima della calibrazione
+        if DEBUG:
+            print(f"Raw temp: {temp_raw * _RAW_A + _RAW_B:.1f}°C")
+            if a != _RAW_A:
                 print(f"Calibrated temp: {temp_c:.1f}°C")
 
-            return round(temp_c, 1)
+        # Arrotonda al decimo senza round()
+        return int(temp_c * 10 + (0.5 if temp_c >= 0 else -0.5)) / 10
 
-        except Exception as e:
-            print(f"Error reading temperature: {e}")
-            import sys
-            sys.print_exception(e)
-            return None
+    def _read_temp(self, register, a=_RAW_A, b=_RAW_B):
+        """
+        Legge la temperatura da un registro
+
+        Args:
+            register: registro da leggere (TA o TOBJ1)
+            a, b: coefficienti della conversione lineare raw -> °C
+
+        Returns:
+            Temperatura in gradi Celsius
+        """
+        return self._to_celsius(self._read_raw(register), a, b)
 
     def read_ambient_temp(self):
         """
@@ -123,7 +196,7 @@ class MLX90614:
         Returns:
             Temperatura in °C o None se errore
         """
-        return self._read_temp(MLX90614_TA)
+        return self._read_temp(MLX90614_TA, self._A, self._B)
 
     def read_object_temp(self):
         """
@@ -132,7 +205,7 @@ class MLX90614:
         Returns:
             Temperatura calibrata in °C o None se errore
         """
-        return self._read_temp(MLX90614_TOBJ1)
+        return self._read_temp(MLX90614_TOBJ1, self._A, self._B)
 
     def read_object_temp_raw(self):
         """
@@ -141,12 +214,8 @@ class MLX90614:
         Returns:
             Temperatura raw in °C o None se errore
         """
-        # Temporaneamente disabilita calibrazione
-        cal_enabled = self._cal_enabled
-        self._cal_enabled = False
-        temp = self._read_temp(MLX90614_TOBJ1)
-        self._cal_enabled = cal_enabled
-        return temp
+        # Coefficienti di default: nessuna calibrazione
+        return self._read_temp(MLX90614_TOBJ1)
 
     def read_both(self):
         """
@@ -155,8 +224,8 @@ class MLX90614:
         Returns:
             Tupla (object_temp, ambient_temp) o (None, None) se errore
         """
+        # Letture consecutive: il sensore non richiede pause tra le transazioni
         obj_temp = self.read_object_temp()
-        time.sleep_ms(10)  # Piccola pausa tra le letture
         amb_temp = self.read_ambient_temp()
         return obj_temp, amb_temp
 
@@ -167,12 +236,20 @@ class MLX90614:
         Returns:
             Tupla (object_temp_calibrated, object_temp_raw, ambient_temp)
         """
-        obj_temp = self.read_object_temp()
-        time.sleep_ms(10)
-        obj_temp_raw = self.read_object_temp_raw()
-        time.sleep_ms(10)
-        amb_temp = self.read_ambient_temp()
-        return obj_temp, obj_temp_raw, amb_temp
+        # Calibrata e raw derivano dalla stessa lettura dell'oggetto
+        obj_raw = self._read_raw(MLX90614_TOBJ1)
+        amb_raw = self._read_raw(MLX90614_TA)
+        a = self._A
+        b = self._B
+        return (self._to_celsius(obj_raw, a, b),
+                self._to_celsius(obj_raw),
+                self._to_celsius(amb_raw, a, b))
+
+    def _read_all_uncalibrated(self):
+        """read_all senza calibrazione: una sola conversione per l'oggetto"""
+        obj_temp = self._to_celsius(self._read_raw(MLX90614_TOBJ1))
+        amb_temp = self._to_celsius(self._read_raw(MLX90614_TA))
+        return obj_temp, obj_temp, amb_temp
 
     # === Funzioni per gestione Emissività EEPROM ===
 
@@ -187,15 +264,10 @@ class MLX90614:
         Returns:
             CRC-8 calcolato
         """
+        table = _CRC8_TABLE
         crc = 0x00
         for byte in data:
-            crc ^= byte
-            for _ in range(8):
-                if crc & 0x80:
-                    crc = (crc << 1) ^ 0x07
-                else:
-                    crc = crc << 1
-            crc &= 0xFF
+            crc = table[crc ^ byte]
         return crc
 
     def read_emissivity(self):
@@ -207,11 +279,10 @@ class MLX90614:
         """
         try:
             # Leggi 3 bytes da EEPROM (2 data + 1 PEC)
-            data = bytearray(3)
-            self.i2c.readfrom_mem_into(self.addr, MLX90614_EEPROM_EMISSIVITY, data)
+            self.i2c.readfrom_mem_into(self.addr, MLX90614_EEPROM_EMISSIVITY, self._buf)
 
             # Estrai valore (16 bit little-endian)
-            raw_value = (data[1] << 8) | data[0]
+            raw_value = struct.unpack_from(_U16, self._buf)[0]
 
             # Converti in emissività (0x0000 = 0.0, 0xFFFF = 1.0)
             emissivity = raw_value / 65535.0
@@ -223,6 +294,31 @@ class MLX90614:
             print(f"Error reading emissivity: {e}")
             return None
 
+    def _write_eeprom_word(self, register, value):
+        """
+        Scrive una parola a 16 bit in EEPROM con PEC, riusando i buffer
+
+        Args:
+            register: indirizzo EEPROM
+            value: valore a 16 bit
+        """
+        lo = value & 0xFF
+        hi = (value >> 8) & 0xFF
+
+        # Calcola CRC (indirizzo + registro + dati)
+        crc_buf = self._crc_buf
+        crc_buf[0] = self.addr << 1
+        crc_buf[1] = register
+        crc_buf[2] = lo
+        crc_buf[3] = hi
+
+        # Scrivi dati + CRC
+        tx = self._tx_buf
+        tx[0] = lo
+        tx[1] = hi
+        tx[2] = self._crc8(crc_buf)
+        self.i2c.writeto_mem(self.addr, register, tx)
+
     def write_emissivity(self, emissivity):
         """
         Scrive un nuovo valore di emissività nella EEPROM
@@ -248,27 +344,11 @@ class MLX90614:
             print(f"Writing emissivity {emissivity:.4f} (0x{raw_value:04X}) to EEPROM...")
 
             # FASE 1: Cancella vecchio valore (write 0x0000)
-            erase_data = bytearray([0x00, 0x00])
-
-            # Calcola CRC per erase (indirizzo + data)
-            crc_data = bytearray([self.addr << 1, MLX90614_EEPROM_EMISSIVITY]) + erase_data
-            crc = self._crc8(crc_data)
-
-            # Scrivi 0x0000 + CRC
-            erase_packet = erase_data + bytearray([crc])
-            self.i2c.writeto_mem(self.addr, MLX90614_EEPROM_EMISSIVITY, erase_packet)
+            self._write_eeprom_word(MLX90614_EEPROM_EMISSIVITY, 0x0000)
             time.sleep_ms(10)  # Wait per erase
 
             # FASE 2: Scrivi nuovo valore
-            write_data = bytearray([raw_value & 0xFF, (raw_value >> 8) & 0xFF])
-
-            # Calcola CRC per write
-            crc_data = bytearray([self.addr << 1, MLX90614_EEPROM_EMISSIVITY]) + write_data
-            crc = self._crc8(crc_data)
-
-            # Scrivi valore + CRC
-            write_packet = write_data + bytearray([crc])
-            self.i2c.writeto_mem(self.addr, MLX90614_EEPROM_EMISSIVITY, write_packet)
+            self._write_eeprom_word(MLX90614_EEPROM_EMISSIVITY, raw_value)
             time.sleep_ms(10)  # Wait per write
 
             # Verifica scrittura
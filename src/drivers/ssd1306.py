@@ -32,6 +32,7 @@ class SSD1306:
         self.external_vcc = external_vcc
         self.pages = self.height // 8
         self.buffer = bytearray(self.pages * self.width)
+        self.buffer_mv = memoryview(self.buffer)  # zero-copy page slices for show_pages()
         fb = framebuf.FrameBuffer(self.buffer, self.width, self.height, framebuf.MONO_VLSB)
         self.framebuf = fb
         self.fill = fb.fill
@@ -111,6 +112,21 @@ class SSD1306:
         self.write_cmd(self.pages - 1)
         self.write_data(self.buffer)
 
+    def show_pages(self, first, last):
+        # send only pages first..last (inclusive)
+        x0 = 0
+        x1 = self.width - 1
+        if self.width == 64:
+            x0 += 32
+            x1 += 32
+        self.write_cmd(SET_COL_ADDR)
+        self.write_cmd(x0)
+        self.write_cmd(x1)
+        self.write_cmd(SET_PAGE_ADDR)
+        self.write_cmd(first)
+        self.write_cmd(last)
+        self.write_data(self.buffer_mv[first * self.width:(last + 1) * self.width])
+
 
 class SSD1306_I2C(SSD1306):
     def __init__(self, width, height, i2c, addr=0x3C, external_vcc=False):
@@ -118,6 +134,14 @@ class SSD1306_I2C(SSD1306):
         self.addr = addr
         self.temp = bytearray(2)
         self.write_list = [b"\x40", None]  # Co=0, D/C#=1
+        # column/page window sent as a single command stream before each frame
+        x0 = 32 if width == 64 else 0  # displays with width of 64 pixels are shifted by 32
+        self.addr_cmd = bytearray(
+            (0x00, SET_COL_ADDR, x0, x0 + width - 1, SET_PAGE_ADDR, 0, height // 8 - 1)
+        )  # Co=0, D/C#=0
+        self.page_cmd = bytearray(self.addr_cmd)
+        # True while the full-screen window is set and the RAM pointer is back at (0, 0)
+        self.full_window = False
         super().__init__(width, height, external_vcc)
 
     def write_cmd(self, cmd):
@@ -129,6 +153,24 @@ class SSD1306_I2C(SSD1306):
         self.write_list[1] = buf
         self.i2c.writevto(self.addr, self.write_list)
 
+    def show(self):
+        # one burst for the 1024-byte buffer; the addressing window is only resent
+        # after show_pages() changed it (horizontal mode wraps back to (0, 0)
+        # at the end of a full frame, so consecutive frames need no commands)
+        if not self.full_window:
+            self.i2c.writeto(self.addr, self.addr_cmd)
+        self.full_window = False
+        self.write_data(self.buffer)
+        self.full_window = True
+
+    def show_pages(self, first, last):
+        self.full_window = False
+        cmd = self.page_cmd
+        cmd[5] = first
+        cmd[6] = last
+        self.i2c.writeto(self.addr, cmd)
+        self.write_data(self.buffer_mv[first * self.width:(last + 1) * self.width])
+
 
 class SSD1306_SPI(SSD1306):
     def __init__(self, width, height, spi, dc, res, cs, external_vcc=False):
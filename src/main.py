@@ -4,12 +4,34 @@ Termometro a infrarossi smart con ESP32-C3, OLED e sensore MLX90614
 """
 import gc
 import sys
-from machine import Pin, I2C
+from machine import Pin, I2C, SoftI2C
 import time
+from time import ticks_ms, ticks_diff, ticks_add
+from micropython import const
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
 
 # Importa driver e configurazione
 from drivers.ssd1306 import SSD1306_I2C
 from config import Config
+from modutil import unload
+
+
+# Indirizzi dei dispositivi I2C attesi
+_ADDR_MLX90614 = const(0x5A)
+_ADDR_SSD1306 = const(0x3C)
+
+
+def _probe(i2c, addr):
+    """True se un dispositivo risponde (ACK) all'indirizzo indicato"""
+    try:
+        i2c.writeto(addr, b'')
+        return True
+    except OSError:
+        return False
 
 
 class SmartThermo:
@@ -22,6 +44,9 @@ class SmartThermo:
         # Carica configurazione
         self.config = Config()
 
+        # Lascia che il runtime raccolga da solo vicino alla soglia di allocazione
+        gc.threshold(gc.mem_free() // 4 + gc.mem_alloc())
+
         # Inizializza I2C
         self.i2c = I2C(
             0,
@@ -31,10 +56,6 @@ class SmartThermo:
         )
         print("I2C initialized")
 
-        # Scansiona I2C per vedere i dispositivi connessi
-        devices = self.i2c.scan()
-        print(f"I2C devices found: {[hex(d) for d in devices]}")
-
         # Inizializza pulsanti per controllo avvio PRIMA di tutto
         # RIGHT per entrare in setup all'avvio
         # FIRE per bloccare l'avvio (debug mode)
@@ -52,15 +73,33 @@ class SmartThermo:
             print("FIRE button is pressed")
             print("="*40 + "\n")
 
+        # Bus dedicato all'OLED se configurato: l'ESP32-C3 ha un solo controller
+        # I2C hardware, quindi il secondo bus è software ma può andare a 400kHz
+        # senza rallentare (o disturbare) l'MLX90614
+        self.i2c_disp = self.i2c
+        if self.config.PIN_SDA_DISP is not None and self.config.PIN_SCL_DISP is not None:
+            self.i2c_disp = SoftI2C(
+                scl=Pin(self.config.PIN_SCL_DISP),
+                sda=Pin(self.config.PIN_SDA_DISP),
+                freq=400000
+            )
+            print("Display I2C initialized (400kHz)")
+
+        # Verifica solo gli indirizzi attesi invece di scansionare tutto il bus
+        # (ogni transazione è comunque limitata dal timeout del driver I2C)
+        found = [hex(a) for bus, a in ((self.i2c, _ADDR_MLX90614), (self.i2c_disp, _ADDR_SSD1306))
+                 if _probe(bus, a)]
+        print(f"I2C devices found: {found}")
+
         # Inizializza display OLED
         try:
-            self.display = SSD1306_I2C(128, 64, self.i2c)
+            self.display = SSD1306_I2C(128, 64, self.i2c_disp)
             print("Display initialized")
         except Exception as e:
             print(f"Error initializing display: {e}")
             self.display = None
 
-        # Mostra splash screen (dà 1 secondo per premere FIRE)
+        # Mostra splash screen (l'attesa per premere FIRE avviene in run())
         if self.display:
             self.show_splash()
 
@@ -73,13 +112,26 @@ class SmartThermo:
         self.display.text("for Debug", 28, 55, 1)
         self.display.show()
 
-        # Sleep più lungo per dare tempo di premere FIRE
-        # Durante questo tempo controlliamo continuamente
-        start = time.ticks_ms()
-        while time.ticks_diff(time.ticks_ms(), start) < 1500:  # 1.5 secondi
+    async def _splash_wait(self):
+        """Lascia 1.5 secondi per premere FIRE/RIGHT, controllando FIRE"""
+        if not self.display:
+            return
+        deadline = ticks_add(ticks_ms(), 1500)
+        while ticks_diff(deadline, ticks_ms()) > 0:
             if self.btn_fire.value() == 0:
                 print("DEBUG: FIRE pressed during splash!")
-            time.sleep(0.1)
+            await asyncio.sleep_ms(100)
+
+    async def _preload_app(self):
+        """Importa l'app principale mentre lo splash è a schermo"""
+        await asyncio.sleep_ms(0)  # Lascia partire prima il conteggio dello splash
+        if self.check_debug_mode():
+            return
+        import app
+
+    async def _boot(self):
+        """Attesa dello splash sovrapposta al caricamento dell'app"""
+        await asyncio.gather(self._splash_wait(), self._preload_app())
 
     def check_setup_mode(self):
         """Controlla se entrare in modalità setup (pulsante RIGHT premuto all'avvio)"""
@@ -97,10 +149,9 @@ class SmartThermo:
         import setup
         setup.main(self.display, self.i2c)
 
-        # Cleanup del modulo setup per liberare memoria
-        del sys.modules['setup']
+        # Cleanup del modulo setup per liberare memoria (se non congelato)
         del setup
-        gc.collect()
+        unload('setup')
 
         print("Setup mode exited")
 
@@ -134,17 +185,20 @@ class SmartThermo:
         import app
         app.main(self.display, self.i2c)
 
-        # Cleanup del modulo app per liberare memoria
-        del sys.modules['app']
+        # Cleanup del modulo app per liberare memoria (se non congelato)
         del app
-        gc.collect()
+        unload('app')
 
         print("Main app exited")
 
     def run(self):
         """Loop principale"""
+        asyncio.run(self._boot())
+
         # Controlla se entrare in setup
         if self.check_setup_mode():
+            # Il setup ha bisogno della RAM: scarta l'app precaricata
+            unload('app')
             self.run_setup()
 
         # Avvia app principale
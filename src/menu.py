@@ -3,8 +3,24 @@ Sistema di menu navigabile generico per GUI
 Supporta diversi tipi di voci: Label, Level, Action, Int, Float, IP, List, Bool
 """
 import gc
-from machine import Pin
+from array import array
+from machine import Pin, idle, disable_irq, enable_irq
+from micropython import const
 import time
+from time import ticks_ms, ticks_diff, ticks_add
+
+# Bit dei pulsanti nella maschera impostata dagli IRQ
+_BTN_UP = const(1)
+_BTN_DOWN = const(2)
+_BTN_LEFT = const(4)
+_BTN_RIGHT = const(8)
+
+# Garbage collection opportunistica: al più ogni 2 s e solo con heap sotto soglia
+_GC_MS = const(2000)
+_GC_MIN_FREE = const(8192)
+
+# Profondità massima dei sottomenu
+_MAX_DEPTH = const(8)
 
 class MenuItem:
     """Classe base per una voce di menu"""
@@ -36,6 +52,9 @@ class MenuItem:
                 - choices: lista di scelte (per LIST)
                 - get_value: funzione per ottenere valore corrente
                 - set_value: funzione per impostare valore
+                - path: chiave del valore; se presente get_value(path, default)
+                  e set_value(path, value) la ricevono (es. Config.get/set)
+                - default: valore di default passato a get_value con path
         """
         self.type = item_type
         self.label = label
@@ -47,20 +66,65 @@ class MenuItem:
         self.choices = kwargs.get('choices', [])
         self.get_value = kwargs.get('get_value', None)
         self.set_value = kwargs.get('set_value', None)
+        self.path = kwargs.get('path', None)
+        self.default = kwargs.get('default', None)
 
         # Valore interno (usato se non ci sono get/set_value)
         self._value = kwargs.get('value', None)
 
+        # Ottetti dell'IP in editing (TYPE_IP), letti una volta all'ingresso in editing
+        self._ip_bytes = None
+
+        # Indice della scelta corrente (TYPE_LIST), letto all'ingresso in editing;
+        # -1 se il valore non è tra le scelte
+        self._list_idx = -1
+
+    def load_list_index(self):
+        """Ricava l'indice della scelta dal valore corrente (una ricerca per sessione di editing)"""
+        val = self.get_current_value()
+        self._list_idx = self.choices.index(val) if val in self.choices else -1
+
+    def step_list(self, delta):
+        """Passa alla scelta precedente/successiva e la salva"""
+        choices = self.choices
+        if not choices:
+            self.set_current_value(None)
+            return
+        idx = self._list_idx
+        # Valore fuori lista: riparte dalla prima scelta
+        idx = 0 if idx < 0 else (idx + delta) % len(choices)
+        self._list_idx = idx
+        self.set_current_value(choices[idx])
+
+    def load_ip(self):
+        """Carica gli ottetti dal valore corrente (una sola split per sessione di editing)"""
+        ip = self.get_current_value() or '0.0.0.0'
+        self._ip_bytes = bytearray(int(x) for x in ip.split('.'))
+
+    def step_ip(self, index, delta):
+        """Modifica un ottetto in place e salva la stringa risultante"""
+        octets = self._ip_bytes
+        if octets is None:
+            self.load_ip()
+            octets = self._ip_bytes
+        octets[index] = min(max(octets[index] + delta, 0), 255)
+        self.set_current_value('%d.%d.%d.%d' % (octets[0], octets[1], octets[2], octets[3]))
+
     def get_current_value(self):
         """Ottiene il valore corrente"""
         if self.get_value:
-            return self.get_value()
+            if self.path is None:
+                return self.get_value()
+            return self.get_value(self.path, self.default)
         return self._value
 
     def set_current_value(self, value):
         """Imposta il valore corrente"""
         if self.set_value:
-            self.set_value(value)
+            if self.path is None:
+                self.set_value(value)
+            else:
+                self.set_value(self.path, value)
         else:
             self._value = value
 
@@ -82,9 +146,16 @@ class Menu:
         self.root_items = root_items
         self.current_items = root_items
         self.current_index = 0
-        self.level_stack = []  # Stack per tenere traccia dei livelli
+        # Stack dei livelli come liste parallele: voci, indice e scroll (senza tuple);
+        # indice e scroll in array preallocati indicizzati dalla profondità
+        self.level_stack = []
+        self._stack_idx = array('H', [0] * _MAX_DEPTH)
+        self._stack_scroll = array('H', [0] * _MAX_DEPTH)
         self.editing = False  # Flag per modalità editing
         self.edit_index = 0  # Indice per editing (es. cifra IP)
+        self._line_cache = {}  # MenuItem -> (stato, testo) dell'ultima render
+        self._full_redraw = True  # Schermo da ridisegnare per intero (avvio, dopo azioni)
+        self._next_gc = ticks_add(ticks_ms(), _GC_MS)
 
         # Inizializza i pulsanti
         self._init_buttons()
@@ -92,6 +163,7 @@ class Menu:
         # Parametri di visualizzazione
         self.visible_items = 5  # Numero di voci visibili
         self.scroll_offset = 0  # Offset per scrolling
+        self._rows = [None] * self.visible_items  # Testo mostrato per riga
 
     def _init_buttons(self):
         """Inizializza i pulsanti di navigazione"""
@@ -104,31 +176,98 @@ class Menu:
         self.last_btn_time = 0
         self.debounce_ms = 200
 
-    def _read_button(self, btn):
-        """Legge un pulsante con debouncing"""
-        now = time.ticks_ms()
-        if time.ticks_diff(now, self.last_btn_time) < self.debounce_ms:
-            return False
-
-        if btn.value() == 0:  # Pulsante premuto (pull-up)
-            self.last_btn_time = now
-            return True
-        return False
+        # Pressioni segnalate dagli IRQ (fronte di discesa), consumate da handle_input
+        self._btn_bits = {
+            self.btn_up: _BTN_UP,
+            self.btn_down: _BTN_DOWN,
+            self.btn_left: _BTN_LEFT,
+            self.btn_right: _BTN_RIGHT
+        }
+        self._pressed = 0
+        self._attach_irqs()
+
+    def _attach_irqs(self):
+        """Collega gli IRQ dei pulsanti al menu"""
+        for btn in self._btn_bits:
+            btn.irq(trigger=Pin.IRQ_FALLING, handler=self._btn_isr)
+
+    def _btn_isr(self, pin):
+        """Handler IRQ dei pulsanti: registra la pressione nella maschera"""
+        bit = self._btn_bits.get(pin)
+        if bit:
+            self._pressed |= bit
+
+    def _take_pressed(self):
+        """Consuma la maschera delle pressioni (IRQ sospesi durante la lettura)"""
+        state = disable_irq()
+        pressed = self._pressed
+        self._pressed = 0
+        enable_irq(state)
+        return pressed
 
     def handle_input(self):
         """Gestisce l'input dai pulsanti e ritorna True se c'è stato un cambiamento"""
-        changed = False
-
-        if self._read_button(self.btn_up):
-            changed = self._handle_up()
-        elif self._read_button(self.btn_down):
-            changed = self._handle_down()
-        elif self._read_button(self.btn_left):
-            changed = self._handle_left()
-        elif self._read_button(self.btn_right):
-            changed = self._handle_right()
+        pressed = self._take_pressed()
+        if not pressed:
+            return False
 
-        return changed
+        # Debouncing: i rimbalzi dopo una pressione vengono scartati
+        now = ticks_ms()
+        if ticks_diff(now, self.last_btn_time) < self.debounce_ms:
+            return False
+        self.last_btn_time = now
+
+        if pressed & _BTN_UP:
+            return self._handle_up()
+        elif pressed & _BTN_DOWN:
+            return self._handle_down()
+        elif pressed & _BTN_LEFT:
+            return self._handle_left()
+        return self._handle_right()
+
+    # === Modifica del valore in editing (UP: up=True, DOWN: up=False) ===
+
+    def _edit_numeric(self, item, up):
+        """INT/FLOAT: incrementa/decrementa di step entro i limiti"""
+        val = item.get_current_value()
+        if up:
+            val = min(val + item.step, item.max_val)
+        else:
+            val = max(val - item.step, item.min_val)
+        item.set_current_value(val)
+
+    def _edit_bool(self, item, up):
+        """BOOL: UP attiva, DOWN disattiva"""
+        item.set_current_value(up)
+
+    def _edit_list(self, item, up):
+        """LIST: scelta precedente/successiva (indice già in memoria)"""
+        item.step_list(-1 if up else 1)
+
+    def _edit_ip(self, item, up):
+        """IP: incrementa/decrementa l'ottetto corrente (ottetti già in memoria)"""
+        item.step_ip(self.edit_index, 1 if up else -1)
+
+    # Tipo di voce -> funzione di modifica
+    _EDIT_DISPATCH = {
+        MenuItem.TYPE_INT: _edit_numeric,
+        MenuItem.TYPE_FLOAT: _edit_numeric,
+        MenuItem.TYPE_BOOL: _edit_bool,
+        MenuItem.TYPE_LIST: _edit_list,
+        MenuItem.TYPE_IP: _edit_ip,
+    }
+
+    def _edit_value(self, current_item, up):
+        """Applica UP/DOWN al valore in editing tramite la tabella per tipo"""
+        handler = self._EDIT_DISPATCH.get(current_item.type)
+        if handler is None:
+            return False
+        try:
+            handler(self, current_item, up)
+            return True
+        except Exception as e:
+            print(f"Error editing {current_item.label}: {e}")
+            return False
 
     def _handle_up(self):
         """Gestisce pulsante UP"""
@@ -136,48 +275,15 @@ class Menu:
 
         if self.editing:
             # Modalità editing: incrementa valore
-            try:
-                if current_item.type == MenuItem.TYPE_INT:
-                    val = current_item.get_current_value()
-                    val = min(val + current_item.step, current_item.max_val)
-                    current_item.set_current_value(val)
-                    return True
-                elif current_item.type == MenuItem.TYPE_FLOAT:
-                    val = current_item.get_current_value()
-                    val = min(val + current_item.step, current_item.max_val)
-                    current_item.set_current_value(val)
-                    return True
-                elif current_item.type == MenuItem.TYPE_BOOL:
-                    current_item.set_current_value(True)
-                    return True
-                elif current_item.type == MenuItem.TYPE_LIST:
-                    choices = current_item.choices
-                    val = current_item.get_current_value()
-                    try:
-                        idx = choices.index(val)
-                        idx = (idx - 1) % len(choices)
-                        current_item.set_current_value(choices[idx])
-                    except ValueError:
-                        current_item.set_current_value(choices[0] if choices else None)
-                    return True
-                elif current_item.type == MenuItem.TYPE_IP:
-                    # Incrementa la cifra corrente dell'IP
-                    ip = current_item.get_current_value()
-                    octets = [int(x) for x in ip.split('.')]
-                    octets[self.edit_index] = min(octets[self.edit_index] + 1, 255)
-                    current_item.set_current_value('.'.join(map(str, octets)))
-                    return True
-            except Exception as e:
-                print(f"Error in _handle_up: {e}")
-                return False
-        else:
-            # Modalità navigazione: scorre su
-            if self.current_index > 0:
-                self.current_index -= 1
-                # Aggiusta scroll offset
-                if self.current_index < self.scroll_offset:
-                    self.scroll_offset = self.current_index
-                return True
+            return self._edit_value(current_item, True)
+
+        # Modalità navigazione: scorre su
+        if self.current_index > 0:
+            self.current_index -= 1
+            # Aggiusta scroll offset
+            if self.current_index < self.scroll_offset:
+                self.scroll_offset = self.current_index
+            return True
         return False
 
     def _handle_down(self):
@@ -186,48 +292,15 @@ class Menu:
 
         if self.editing:
             # Modalità editing: decrementa valore
-            try:
-                if current_item.type == MenuItem.TYPE_INT:
-                    val = current_item.get_current_value()
-                    val = max(val - current_item.step, current_item.min_val)
-                    current_item.set_current_value(val)
-                    return True
-                elif current_item.type == MenuItem.TYPE_FLOAT:
-                    val = current_item.get_current_value()
-                    val = max(val - current_item.step, current_item.min_val)
-                    current_item.set_current_value(val)
-                    return True
-                elif current_item.type == MenuItem.TYPE_BOOL:
-                    current_item.set_current_value(False)
-                    return True
-                elif current_item.type == MenuItem.TYPE_LIST:
-                    choices = current_item.choices
-                    val = current_item.get_current_value()
-                    try:
-                        idx = choices.index(val)
-                        idx = (idx + 1) % len(choices)
-                        current_item.set_current_value(choices[idx])
-                    except ValueError:
-                        current_item.set_current_value(choices[0] if choices else None)
-                    return True
-                elif current_item.type == MenuItem.TYPE_IP:
-                    # Decrementa la cifra corrente dell'IP
-                    ip = current_item.get_current_value()
-                    octets = [int(x) for x in ip.split('.')]
-                    octets[self.edit_index] = max(octets[self.edit_index] - 1, 0)
-                    current_item.set_current_value('.'.join(map(str, octets)))
-                    return True
-            except Exception as e:
-                print(f"Error in _handle_down: {e}")
-                return False
-        else:
-            # Modalità navigazione: scorre giù
-            if self.current_index < len(self.current_items) - 1:
-                self.current_index += 1
-                # Aggiusta scroll offset
-                if self.current_index >= self.scroll_offset + self.visible_items:
-                    self.scroll_offset = self.current_index - self.visible_items + 1
-                return True
+            return self._edit_value(current_item, False)
+
+        # Modalità navigazione: scorre giù
+        if self.current_index < len(self.current_items) - 1:
+            self.current_index += 1
+            # Aggiusta scroll offset
+            if self.current_index >= self.scroll_offset + self.visible_items:
+                self.scroll_offset = self.current_index - self.visible_items + 1
+            return True
         return False
 
     def _handle_left(self):
@@ -248,7 +321,10 @@ class Menu:
         else:
             # Esci dal livello corrente
             if self.level_stack:
-                self.current_items, self.current_index, self.scroll_offset = self.level_stack.pop()
+                self.current_items = self.level_stack.pop()
+                depth = len(self.level_stack)
+                self.current_index = self._stack_idx[depth]
+                self.scroll_offset = self._stack_scroll[depth]
                 return True
         return False
 
@@ -267,13 +343,18 @@ class Menu:
             if current_item.type == MenuItem.TYPE_LEVEL:
                 # Entra nel sottolivello
                 if current_item.items:
-                    self.level_stack.append((self.current_items, self.current_index, self.scroll_offset))
+                    depth = len(self.level_stack)
+                    self._stack_idx[depth] = self.current_index
+                    self._stack_scroll[depth] = self.scroll_offset
+                    self.level_stack.append(self.current_items)
                     self.current_items = current_item.items
                     self.current_index = 0
                     self.scroll_offset = 0
                     return True
             elif current_item.type == MenuItem.TYPE_ACTION:
                 # Esegue l'azione con gestione errori
+                # (l'azione può disegnare sul display: poi serve un ridisegno completo)
+                self._full_redraw = True
                 if current_item.action:
                     try:
                         current_item.action()
@@ -287,76 +368,128 @@ class Menu:
                         self.display.show()
                         import time
                         time.sleep(2)
+                # Le schermate delle azioni leggono i pulsanti da sole (anche via
+                # IRQ propri): ricollega gli IRQ e scarta le pressioni intermedie
+                self._attach_irqs()
+                self._pressed = 0
                 return True
             elif current_item.type in [MenuItem.TYPE_INT, MenuItem.TYPE_FLOAT,
                                        MenuItem.TYPE_BOOL, MenuItem.TYPE_LIST, MenuItem.TYPE_IP]:
                 # Entra in modalità editing
+                if current_item.type == MenuItem.TYPE_IP:
+                    current_item.load_ip()
+                elif current_item.type == MenuItem.TYPE_LIST:
+                    current_item.load_list_index()
                 self.editing = True
                 self.edit_index = 0
                 return True
         return False
 
+    def _format_line(self, item, selected, editing, val):
+        """Costruisce il testo di una riga (senza f-string intermedie)"""
+        item_type = item.type
+        TYPE_IP = MenuItem.TYPE_IP
+
+        # Indicatore di selezione / editing
+        if editing and item_type != TYPE_IP:
+            parts = ['*', item.label]
+        else:
+            parts = ['>' if selected else ' ', item.label]
+
+        # Aggiunge il valore per i tipi editabili
+        if item_type == MenuItem.TYPE_BOOL:
+            parts.append(': ON' if val else ': OFF')
+        elif item_type == MenuItem.TYPE_INT or item_type == MenuItem.TYPE_LIST:
+            parts.append(': ')
+            parts.append(str(val))
+        elif item_type == MenuItem.TYPE_FLOAT:
+            parts.append(': ')
+            parts.append('%.2f' % val)
+        elif item_type == TYPE_IP:
+            parts.append(': ')
+            octets = item._ip_bytes
+            if editing and octets is not None:
+                # Evidenzia la cifra in editing direttamente dagli ottetti
+                edit_index = self.edit_index
+                for n in range(4):
+                    if n:
+                        parts.append('.')
+                    if n == edit_index:
+                        parts.append('[%d]' % octets[n])
+                    else:
+                        parts.append(str(octets[n]))
+            else:
+                parts.append(val)
+        elif item_type == MenuItem.TYPE_LEVEL:
+            parts.append(' >')
+
+        # Troncato se troppo lungo
+        return ''.join(parts)[:21]
+
     def render(self):
-        """Renderizza il menu sul display"""
-        self.display.fill(0)
+        """Renderizza il menu sul display, inviando solo le pagine cambiate"""
+        display = self.display
+        full = self._full_redraw
+        if full:
+            display.fill(0)
+            self._full_redraw = False
 
         # Calcola quali voci visualizzare
+        items = self.current_items
         start_idx = self.scroll_offset
-        end_idx = min(start_idx + self.visible_items, len(self.current_items))
+        end_idx = min(start_idx + self.visible_items, len(items))
+        cache = self._line_cache
+        rows = self._rows
 
+        dirty_pages = 0
         y = 0
-        for i in range(start_idx, end_idx):
-            item = self.current_items[i]
-
-            # Indicatore di selezione
-            prefix = '>' if i == self.current_index else ' '
-
-            # Costruisce la stringa da visualizzare
-            text = f"{prefix}{item.label}"
-
-            # Aggiunge il valore per i tipi editabili
-            try:
-                if item.type == MenuItem.TYPE_BOOL:
+        current_index = self.current_index
+        in_edit = self.editing
+        for row in range(self.visible_items):
+            i = start_idx + row
+            if i < end_idx:
+                item = items[i]
+                selected = i == current_index
+                editing = selected and in_edit
+
+                try:
                     val = item.get_current_value()
-                    text += f": {'ON' if val else 'OFF'}"
-                elif item.type == MenuItem.TYPE_INT:
-                    val = item.get_current_value()
-                    text += f": {val}"
-                elif item.type == MenuItem.TYPE_FLOAT:
-                    val = item.get_current_value()
-                    text += f": {val:.2f}"
-                elif item.type == MenuItem.TYPE_LIST:
-                    val = item.get_current_value()
-                    text += f": {val}"
-                elif item.type == MenuItem.TYPE_IP:
-                    val = item.get_current_value()
-                    if self.editing and i == self.current_index:
-                        # Evidenzia la cifra in editing
-                        octets = val.split('.')
-                        highlighted = octets[self.edit_index]
-                        octets[self.edit_index] = f"[{highlighted}]"
-                        text += f": {'.'.join(octets)}"
+                    # Riusa il testo se selezione, editing e valore non sono cambiati
+                    key = (selected, editing, self.edit_index if editing else 0, val)
+                    cached = cache.get(item)
+                    if cached is not None and cached[0] == key:
+                        text = cached[1]
                     else:
-                        text += f": {val}"
-                elif item.type == MenuItem.TYPE_LEVEL:
-                    text += " >"
-            except Exception as e:
-                # Se c'è un errore nel recupero del valore, mostra l'errore
-                text += ": ERR"
-                print(f"Menu render error for {item.label}: {e}")
-
-            # Indicatore di editing
-            if self.editing and i == self.current_index and item.type != MenuItem.TYPE_IP:
-                text = "*" + text[1:]
-
-            # Disegna il testo (troncato se troppo lungo)
-            if len(text) > 21:
-                text = text[:21]
-
-            self.display.text(text, 0, y, 1)
+                        text = self._format_line(item, selected, editing, val)
+                        cache[item] = (key, text)
+                except Exception as e:
+                    # Se c'è un errore nel recupero del valore, mostra l'errore
+                    text = ('>' if selected else ' ') + item.label + ': ERR'
+                    print(f"Menu render error for {item.label}: {e}")
+            else:
+                text = None
+
+            # Ridisegna solo le righe il cui testo è cambiato
+            if full or text != rows[row]:
+                rows[row] = text
+                if not full:
+                    display.fill_rect(0, y, display.width, 8, 0)
+                if text is not None:
+                    display.text(text, 0, y, 1)
+                # Pagine coperte dalla riga (8 px a partire da y)
+                dirty_pages |= (1 << (y >> 3)) | (1 << ((y + 7) >> 3))
             y += 12
 
-        self.display.show()
+        if full:
+            display.show()
+        elif dirty_pages:
+            first = 0
+            while not dirty_pages & (1 << first):
+                first += 1
+            last = 7
+            while not dirty_pages & (1 << last):
+                last -= 1
+            display.show_pages(first, last)
 
     def run(self):
         """Loop principale del menu. Ritorna quando si esce dal menu."""
@@ -365,16 +498,26 @@ class Menu:
         while True:
             if self.handle_input():
                 self.render()
-                gc.collect()
+
+                # Raccogli solo se l'heap è sotto pressione (la soglia gc fa il resto)
+                now = ticks_ms()
+                if ticks_diff(now, self._next_gc) > 0 and gc.mem_free() < _GC_MIN_FREE:
+                    gc.collect()
+                    self._next_gc = ticks_add(now, _GC_MS)
 
             # Verifica se siamo usciti completamente dal menu
             if not self.level_stack and self.current_items == []:
                 break
 
-            time.sleep_ms(50)  # Piccola pausa per non saturare la CPU
+            # Attendi il prossimo interrupt invece di interrogare i pulsanti
+            while not self._pressed:
+                idle()
 
     def cleanup(self):
         """Libera le risorse"""
+        for btn in self._btn_bits:
+            btn.irq(handler=None)
+        self._btn_bits = None
         del self.btn_up
         del self.btn_down
         del self.btn_left
@@ -0,0 +1,19 @@
+"""
+Utility per i moduli caricati al bisogno
+Condivisa da main.py e app.py
+"""
+import gc
+import sys
+
+
+def unload(modname):
+    """
+    Rimuove un modulo per recuperarne la RAM
+    I moduli congelati nel firmware (vedi manifest.py) restano in flash:
+    scaricarli non libera nulla e il re-import è immediato, quindi si lasciano
+    """
+    mod = sys.modules.get(modname)
+    if mod is None or getattr(mod, '__file__', '').startswith('.frozen'):
+        return
+    del sys.modules[modname]
+    gc.collect()
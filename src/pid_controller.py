@@ -1,8 +1,17 @@
 """
 Controllore PID per termostato
-Implementazione semplice di un controllore PID
+Implementazione semplice di un controllore PID in virgola fissa
 """
-import time
+from time import ticks_ms, ticks_diff
+import micropython
+from micropython import const
+
+# Guadagni in Q16.16, grandezze di processo in centesimi di grado:
+# per guadagni ed errori tipici i prodotti restano small int (nessuna allocazione)
+_Q = const(16)
+_ONE = const(65536)
+_INTEGRAL_MAX = const(10000000)  # 100 °C·s in centesimi·ms
+_OUTPUT_MAX = const(10000)    # 100% in centesimi
 
 
 class PIDController:
@@ -18,18 +27,16 @@ class PIDController:
             kd: guadagno derivativo
             setpoint: valore target
         """
-        self.kp = kp
-        self.ki = ki
-        self.kd = kd
-        self.setpoint = setpoint
+        self.set_tunings(kp, ki, kd)
+        self.set_setpoint(setpoint)
 
-        self._last_error = 0
+        self._last_error = None
         self._integral = 0
-        self._last_time = time.ticks_ms()
+        self._last_time = ticks_ms()
 
     def update(self, current_value):
         """
-        Calcola l'output del PID
+        Calcola l'output del PID misurando l'intervallo dall'ultimo update
 
         Args:
             current_value: valore corrente
@@ -37,53 +44,73 @@ class PIDController:
         Returns:
             Output del PID (0-100%)
         """
-        now = time.ticks_ms()
-        dt = time.ticks_diff(now, self._last_time) / 1000.0  # in secondi
+        return self.update_dt(current_value, ticks_diff(ticks_ms(), self._last_time))
+
+    @micropython.native
+    def update_dt(self, current_value, dt_ms):
+        """
+        Calcola l'output del PID
 
-        if dt <= 0:
-            dt = 0.001
+        Args:
+            current_value: valore corrente
+            dt_ms: intervallo dall'ultimo update in ms
+
+        Returns:
+            Output del PID (0-100%)
+        """
+        now = ticks_ms()
+        if dt_ms <= 0:
+            dt_ms = 1
 
-        # Calcola errore
-        error = self.setpoint - current_value
+        # Calcola errore (centesimi di grado)
+        error = self._setpoint - int(current_value * 100)
+        last_error = self._last_error
+        if last_error is None:
+            last_error = error  # Primo campione: niente salto su integrale e derivata
 
         # Proporzionale
-        p_term = self.kp * error
+        p_term = (self._kp * error) >> _Q
 
-        # Integrale (con anti-windup)
-        self._integral += error * dt
+        # Integrale con regola dei trapezi (con anti-windup)
+        integral = self._integral + (error + last_error) * dt_ms // 2
         # Limita integrale per evitare windup
-        self._integral = max(min(self._integral, 100), -100)
-        i_term = self.ki * self._integral
+        if integral > _INTEGRAL_MAX:
+            integral = _INTEGRAL_MAX
+        elif integral < -_INTEGRAL_MAX:
+            integral = -_INTEGRAL_MAX
+        self._integral = integral
+        i_term = (self._ki * (integral // 1000)) >> _Q
 
         # Derivativo
-        d_term = 0
-        if dt > 0:
-            d_term = self.kd * (error - self._last_error) / dt
+        d_term = ((self._kd * (error - last_error)) >> _Q) * 1000 // dt_ms
 
         # Output totale
         output = p_term + i_term + d_term
 
         # Limita output 0-100%
-        output = max(min(output, 100), 0)
+        if output > _OUTPUT_MAX:
+            output = _OUTPUT_MAX
+        elif output < 0:
+            output = 0
 
         # Salva stato
         self._last_error = error
         self._last_time = now
 
-        return output
+        return output / 100
 
     def set_tunings(self, kp, ki, kd):
         """Aggiorna i parametri PID"""
-        self.kp = kp
-        self.ki = ki
-        self.kd = kd
+        self._kp = int(kp * _ONE)
+        self._ki = int(ki * _ONE)
+        self._kd = int(kd * _ONE)
 
     def set_setpoint(self, setpoint):
         """Aggiorna il setpoint"""
-        self.setpoint = setpoint
+        self._setpoint = int(setpoint * 100)
 
     def reset(self):
         """Reset del controllore"""
         self._integral = 0
-        self._last_error = 0
-        self._last_time = time.ticks_ms()
+        self._last_error = None
+        self._last_time = ticks_ms()
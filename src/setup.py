@@ -3,8 +3,31 @@ App Setup - Interfaccia di configurazione per SmartThermo
 Crea un menu navigabile per modificare tutte le impostazioni
 """
 import gc
+from array import array
+from machine import Pin, idle
+from micropython import const
+import time
+from time import ticks_ms, ticks_diff
 from menu import Menu, MenuItem
 from config import Config
+from setup_schema import SCHEMA
+
+# Righe della schermata di calibrazione (formattazione % senza f-string)
+_ENABLE_FMT = "%sEnable: %s"
+_ROW_FMT = "%s%4.1f %5.1f"
+_EDIT_FMT = "%s%4.1f>[%5.1f]"
+_UPDATE_ROWS = (" Update", ">Update")
+
+# Eventi pulsante della calibrazione (indici nella tabella di salto)
+_EV_UP = const(0)
+_EV_DOWN = const(1)
+_EV_LEFT = const(2)
+_EV_RIGHT = const(3)
+_EV_FIRE = const(4)
+_EV_QUEUE = const(8)  # Dimensione della coda eventi (potenza di 2)
+
+# Durata delle schermate di conferma
+_CONFIRM_MS = const(1000)
 
 
 class SetupApp:
@@ -25,205 +48,73 @@ class SetupApp:
         self.menu = None
         self.exit_requested = False
         self.autotune_callback = autotune_callback
+        self._ssids = None  # SSID noti, letti una volta per costruzione del menu
 
     def _build_menu_tree(self):
-        """Costruisce l'albero del menu di setup"""
-
-        # === WIFI MENU ===
-        wifi_items = [
-            MenuItem(
-                MenuItem.TYPE_LIST,
-                "Mode",
-                choices=["Off", "AP", "STA", "BOTH"],
-                get_value=lambda: self.config.wifi_mode,
-                set_value=lambda v: self.config.set('wifi.mode', v)
-            ),
-            MenuItem(
-                MenuItem.TYPE_LIST,
-                "SSID",
-                choices=self._get_known_ssids(),
-                get_value=lambda: self._get_selected_ssid(),
-                set_value=lambda v: self._set_selected_ssid(v)
-            ),
-        ]
-
-        # === PREFERENCES MENU ===
-        preferences_items = [
-            MenuItem(
-                MenuItem.TYPE_BOOL,
-                "Laser",
-                get_value=lambda: self.config.laser_enabled,
-                set_value=lambda v: self.config.set('preferences.laser', v)
-            ),
-            MenuItem(
-                MenuItem.TYPE_BOOL,
-                "BigNum",
-                get_value=lambda: self.config.bignum_enabled,
-                set_value=lambda v: self.config.set('preferences.bignum', v)
-            ),
-            MenuItem(
-                MenuItem.TYPE_LIST,
-                "Reading",
-                choices=["OnShoot", "Continue"],
-                get_value=lambda: self.config.reading_mode,
-                set_value=lambda v: self.config.set('preferences.reading', v)
-            ),
-            MenuItem(
-                MenuItem.TYPE_INT,
-                "Refresh",
-                min_val=50,
-                max_val=1000,
-                step=50,
-                get_value=lambda: self.config.refresh_rate,
-                set_value=lambda v: self.config.set('preferences.refresh', v)
-            ),
-        ]
-
-        # === THERMOSTAT MENU ===
-        thermostat_items = [
-            MenuItem(
-                MenuItem.TYPE_BOOL,
-                "Active",
-                get_value=lambda: self.config.thermostat_active,
-                set_value=lambda v: self.config.set('thermostat.active', v)
-            ),
-            MenuItem(
-                MenuItem.TYPE_INT,
-                "Target",
-                min_val=0,
-                max_val=150,
-                step=1,
-                get_value=lambda: self.config.thermostat_target,
-                set_value=lambda v: self.config.set('thermostat.target', v)
-            ),
-            MenuItem(
-                MenuItem.TYPE_FLOAT,
-                "P",
-                min_val=0.0,
-                max_val=10.0,
-                step=0.1,
-                get_value=lambda: self.config.thermostat_p,
-                set_value=lambda v: self.config.set('thermostat.p', v)
-            ),
-            MenuItem(
-                MenuItem.TYPE_FLOAT,
-                "I",
-                min_val=0.0,
-                max_val=10.0,
-                step=0.1,
-                get_value=lambda: self.config.thermostat_i,
-                set_value=lambda v: self.config.set('thermostat.i', v)
-            ),
-            MenuItem(
-                MenuItem.TYPE_FLOAT,
-                "D",
-                min_val=0.0,
-                max_val=10.0,
-                step=0.1,
-                get_value=lambda: self.config.thermostat_d,
-                set_value=lambda v: self.config.set('thermostat.d', v)
-            ),
-            MenuItem(
-                MenuItem.TYPE_ACTION,
-                "Tune PID",
-                action=lambda: self._autotune_pid()
-            ),
-        ]
-
-        # === TAPO MENU ===
-        tapo_items = [
-            MenuItem(
-                MenuItem.TYPE_BOOL,
-                "Enable",
-                get_value=lambda: self.config.tapo_enabled,
-                set_value=lambda v: self.config.set('tapo.enabled', v)
-            ),
-            MenuItem(
-                MenuItem.TYPE_IP,
-                "IP",
-                get_value=lambda: self.config.tapo_ip,
-                set_value=lambda v: self.config.set('tapo.ip', v)
-            ),
-        ]
-
-        # === EMISSIVITY MENU ===
-        emissivity_items = [
-            MenuItem(
-                MenuItem.TYPE_LIST,
-                "Material",
-                choices=self._get_emissivity_materials(),
-                get_value=lambda: self.config.emissivity_material_type,
-                set_value=lambda v: self.config.set('emissivity.material_type', v)
-            ),
-            MenuItem(
-                MenuItem.TYPE_FLOAT,
-                "Custom",
-                min_val=0.1,
-                max_val=1.0,
-                step=0.01,
-                get_value=lambda: self.config.emissivity_custom_value,
-                set_value=lambda v: self.config.set('emissivity.custom_value', v)
-            ),
-            MenuItem(MenuItem.TYPE_LABEL, "---"),
-            MenuItem(
-                MenuItem.TYPE_ACTION,
-                "Read EEPROM",
-                action=lambda: self._read_emissivity_eeprom()
-            ),
-            MenuItem(
-                MenuItem.TYPE_ACTION,
-                "Write EEPROM",
-                action=lambda: self._write_emissivity_eeprom()
-            ),
-        ]
-
-        # === ROOT MENU ===
-        root_items = [
-            MenuItem(MenuItem.TYPE_LEVEL, "Wifi", items=wifi_items),
-            MenuItem(MenuItem.TYPE_LEVEL, "Prefs", items=preferences_items),
-            MenuItem(MenuItem.TYPE_LEVEL, "Thermostat", items=thermostat_items),
-            MenuItem(MenuItem.TYPE_LEVEL, "Tapo", items=tapo_items),
-            MenuItem(MenuItem.TYPE_LEVEL, "Emissiv", items=emissivity_items),
-            MenuItem(
-                MenuItem.TYPE_ACTION,
-                "Calibr",
-                action=lambda: self._calibration_menu()
-            ),
-            MenuItem(MenuItem.TYPE_LABEL, "---"),
-            MenuItem(
-                MenuItem.TYPE_ACTION,
-                "Save & Exit",
-                action=lambda: self._save_and_exit()
-            ),
-            MenuItem(
-                MenuItem.TYPE_ACTION,
-                "Exit",
-                action=lambda: self._exit_without_save()
-            ),
-        ]
-
-        return root_items
+        """Costruisce l'albero del menu di setup da setup_schema.SCHEMA"""
+        # Voci non riconducibili a un path di configurazione: path -> (getter, setter)
+        overrides = {
+            'wifi.selected': (self._get_selected_ssid, self._set_selected_ssid),
+        }
+        self.invalidate_ssids()
+        return self._build_items(SCHEMA, overrides)
+
+    def _build_items(self, schema, overrides):
+        """Crea le MenuItem di un livello dello schema (ricorsivo sui sottolivelli)"""
+        get = self.config.get
+        set_value = self.config.set
+        items = []
+        for entry in schema:
+            kind = entry[0]
+            label = entry[1]
+            if kind == MenuItem.TYPE_LEVEL:
+                item = MenuItem(kind, label, items=self._build_items(entry[2], overrides))
+            elif kind == MenuItem.TYPE_ACTION:
+                item = MenuItem(kind, label, action=getattr(self, entry[2]))
+            elif kind == MenuItem.TYPE_LABEL:
+                item = MenuItem(kind, label)
+            else:
+                path = entry[2]
+                if path in overrides:
+                    getter, setter = overrides[path]
+                    item = MenuItem(kind, label, get_value=getter, set_value=setter)
+                else:
+                    item = MenuItem(kind, label, path=path, default=entry[3],
+                                    get_value=get, set_value=set_value)
+                if kind == MenuItem.TYPE_LIST:
+                    choices = entry[4]
+                    # Nome di metodo: scelte lette dalla configurazione
+                    item.choices = getattr(self, choices)() if isinstance(choices, str) else choices
+                elif kind == MenuItem.TYPE_INT or kind == MenuItem.TYPE_FLOAT:
+                    item.min_val = entry[4]
+                    item.max_val = entry[5]
+                    item.step = entry[6]
+            items.append(item)
+        return items
+
+    def invalidate_ssids(self):
+        """Rilegge gli SSID noti dalla configurazione (es. dopo una scansione)"""
+        self._ssids = tuple(net['ssid'] for net in self.config.wifi_known or ())
 
     def _get_known_ssids(self):
         """Ottiene la lista degli SSID noti"""
-        known = self.config.wifi_known
-        return [net['ssid'] for net in known] if known else ["None"]
+        if self._ssids is None:
+            self.invalidate_ssids()
+        return self._ssids or ("None",)
 
     def _get_selected_ssid(self):
         """Ottiene l'SSID selezionato correntemente"""
         selected = self.config.wifi_selected
-        known = self.config.wifi_known
-        if known and 0 <= selected < len(known):
-            return known[selected]['ssid']
+        ssids = self._ssids
+        if ssids and 0 <= selected < len(ssids):
+            return ssids[selected]
         return "None"
 
     def _set_selected_ssid(self, ssid):
         """Imposta l'SSID selezionato"""
-        known = self.config.wifi_known
-        for i, net in enumerate(known):
-            if net['ssid'] == ssid:
-                self.config.set('wifi.selected', i)
-                break
+        ssids = self._ssids
+        if ssids and ssid in ssids:
+            self.config.set('wifi.selected', ssids.index(ssid))
 
     def _autotune_pid(self):
         """Esegue auto-tuning PID chiamando il callback dell'app principale"""
@@ -237,14 +128,10 @@ class SetupApp:
             self.display.text("Not available", 0, 12, 1)
             self.display.text("in setup mode", 0, 24, 1)
             self.display.show()
-            import time
             time.sleep(2)
 
     def _calibration_menu(self):
         """Menu interattivo per calibrazione sensore"""
-        from machine import Pin
-        import time
-
         # Controlla se i2c è disponibile
         if not self.i2c:
             self.display.fill(0)
@@ -272,53 +159,71 @@ class SetupApp:
         btn_left = Pin(self.config.PIN_LEFT, Pin.IN, Pin.PULL_UP)
         btn_right = Pin(self.config.PIN_RIGHT, Pin.IN, Pin.PULL_UP)
         btn_fire = Pin(self.config.PIN_FIRE, Pin.IN, Pin.PULL_UP)
+        events = {
+            btn_up: _EV_UP,
+            btn_down: _EV_DOWN,
+            btn_left: _EV_LEFT,
+            btn_right: _EV_RIGHT,
+            btn_fire: _EV_FIRE
+        }
 
         # Stato calibrazione - carica valori correnti
         cal_enabled = self.config.calibration_enabled
-        cal_points = [
-            {'raw': self.config.calibration_point1_raw, 'real': self.config.calibration_point1_real},
-            {'raw': self.config.calibration_point2_raw, 'real': self.config.calibration_point2_real},
-        ]
+        # Punti come array paralleli (letto dal sensore / reale)
+        cal_raw = array('f', (self.config.calibration_point1_raw, self.config.calibration_point2_raw))
+        cal_real = array('f', (self.config.calibration_point1_real, self.config.calibration_point2_real))
+        n_points = len(cal_raw)
 
         selected_row = 0  # 0=Enable, 1-2=punti, 3=Update
+        total_rows = n_points + 2  # Enable + 2 punti + Update
         editing = False
         edit_value = 0
-        last_button_time = 0
+        running = True
+        dirty = True  # Ridisegna solo quando lo stato cambia
+        # Debounce per pulsante: ultimo istante accettato, indicizzato dall'id evento
+        last_press = array('L', [0] * len(events))
         debounce = 200  # ms
 
-        def read_button(btn):
-            nonlocal last_button_time
-            if btn.value() == 0:
-                now = time.ticks_ms()
-                if time.ticks_diff(now, last_button_time) > debounce:
-                    last_button_time = now
-                    return True
-            return False
+        # Coda circolare degli eventi pulsante: scritta dall'IRQ, letta dal loop
+        ring = bytearray(_EV_QUEUE)
+        head = 0
+        tail = 0
+
+        def on_irq(pin):
+            nonlocal head
+            ev = events.get(pin)
+            if ev is None:
+                return
+            now = ticks_ms()
+            if ticks_diff(now, last_press[ev]) > debounce:
+                last_press[ev] = now
+                nxt = (head + 1) & (_EV_QUEUE - 1)
+                if nxt != tail:  # Coda piena: l'evento viene scartato
+                    ring[head] = ev
+                    head = nxt
 
         def draw_screen():
-            nonlocal cal_enabled
             self.display.fill(0)
 
             # Riga Enable
             cursor = ">" if selected_row == 0 else " "
             enabled_text = "ON" if cal_enabled else "OFF"
-            self.display.text(f"{cursor}Enable: {enabled_text}", 0, 0, 1)
+            self.display.text(_ENABLE_FMT % (cursor, enabled_text), 0, 0, 1)
 
             # Punti di calibrazione
-            for i, point in enumerate(cal_points):
+            for i in range(n_points):
                 y = 12 + (i + 1) * 10
                 cursor = ">" if selected_row == (i + 1) else " "
                 if editing and selected_row == (i + 1):
                     # Evidenzia valore in edit
-                    text = f"{cursor}{point['raw']:4.1f}>[{edit_value:5.1f}]"
+                    text = _EDIT_FMT % (cursor, cal_raw[i], edit_value)
                 else:
-                    text = f"{cursor}{point['raw']:4.1f} {point['real']:5.1f}"
+                    text = _ROW_FMT % (cursor, cal_raw[i], cal_real[i])
                 self.display.text(text[:16], 0, y, 1)
 
             # Riga Update
-            y = 12 + (len(cal_points) + 1) * 10
-            cursor = ">" if selected_row == (len(cal_points) + 1) else " "
-            self.display.text(f"{cursor}Update", 0, y, 1)
+            y = 12 + (n_points + 1) * 10
+            self.display.text(_UPDATE_ROWS[selected_row == n_points + 1], 0, y, 1)
 
             # Footer hint
             if editing:
@@ -328,70 +233,100 @@ class SetupApp:
 
             self.display.show()
 
-        # Loop principale menu calibrazione
-        running = True
-        total_rows = len(cal_points) + 2  # Enable + 2 punti + Update
-        while running:
-            draw_screen()
-
+        def on_up():
+            nonlocal edit_value, selected_row, dirty
             if editing:
                 # Modalità editing valore Real
-                if read_button(btn_up):
-                    edit_value += 1
-                    edit_value = min(edit_value, 500)
-                elif read_button(btn_down):
-                    edit_value -= 1
-                    edit_value = max(edit_value, 0)
-                elif read_button(btn_right):
-                    # Conferma edit
-                    cal_points[selected_row - 1]['real'] = edit_value
-                    editing = False
-
+                edit_value = min(edit_value + 1, 500)
             else:
                 # Modalità selezione riga
-                if read_button(btn_up):
-                    selected_row = (selected_row - 1) % total_rows
-                elif read_button(btn_down):
-                    selected_row = (selected_row + 1) % total_rows
-                elif read_button(btn_fire):
-                    if selected_row == 0:
-                        # Toggle Enable
-                        cal_enabled = not cal_enabled
-                    elif 1 <= selected_row <= len(cal_points):
-                        # Leggi temperatura e scrivi in RAW
-                        temp_raw = sensor.read_object_temp_raw()
-                        if temp_raw is not None:
-                            cal_points[selected_row - 1]['raw'] = temp_raw
-                elif read_button(btn_left):
-                    if 1 <= selected_row <= len(cal_points):
-                        # Entra in edit mode
-                        edit_value = cal_points[selected_row - 1]['real']
-                        editing = True
-                    else:
-                        # Esci dal menu
-                        running = False
-                elif read_button(btn_right):
-                    if selected_row == total_rows - 1:
-                        # Update: salva calibrazione
-                        self.config.set('calibration.enabled', cal_enabled)
-                        self.config.set('calibration.point1_raw', cal_points[0]['raw'])
-                        self.config.set('calibration.point1_real', cal_points[0]['real'])
-                        self.config.set('calibration.point2_raw', cal_points[1]['raw'])
-                        self.config.set('calibration.point2_real', cal_points[1]['real'])
-
-                        # Mostra conferma
-                        self.display.fill(0)
-                        self.display.text("Calibration", 0, 20, 1)
-                        self.display.text("Updated!", 0, 32, 1)
-                        self.display.show()
-                        time.sleep(1)
-                        running = False
-
-            time.sleep(0.05)
+                selected_row = (selected_row - 1) % total_rows
+            dirty = True
+
+        def on_down():
+            nonlocal edit_value, selected_row, dirty
+            if editing:
+                edit_value = max(edit_value - 1, 0)
+            else:
+                selected_row = (selected_row + 1) % total_rows
+            dirty = True
+
+        def on_left():
+            nonlocal edit_value, editing, running, dirty
+            if editing:
+                return
+            if 1 <= selected_row <= n_points:
+                # Entra in edit mode
+                edit_value = cal_real[selected_row - 1]
+                editing = True
+                dirty = True
+            else:
+                # Esci dal menu
+                running = False
+
+        def on_right():
+            nonlocal editing, running, dirty
+            if editing:
+                # Conferma edit
+                cal_real[selected_row - 1] = edit_value
+                editing = False
+                dirty = True
+            elif selected_row == total_rows - 1:
+                # Update: salva calibrazione
+                self.config.set('calibration.enabled', cal_enabled)
+                self.config.set('calibration.point1_raw', cal_raw[0])
+                self.config.set('calibration.point1_real', cal_real[0])
+                self.config.set('calibration.point2_raw', cal_raw[1])
+                self.config.set('calibration.point2_real', cal_real[1])
+
+                # Mostra conferma
+                self.display.fill(0)
+                self.display.text("Calibration", 0, 20, 1)
+                self.display.text("Updated!", 0, 32, 1)
+                self.display.show()
+                time.sleep(1)
+                running = False
+
+        def on_fire():
+            nonlocal cal_enabled, dirty
+            if editing:
+                return
+            if selected_row == 0:
+                # Toggle Enable
+                cal_enabled = not cal_enabled
+                dirty = True
+            elif 1 <= selected_row <= n_points:
+                # Leggi temperatura e scrivi in RAW
+                temp_raw = sensor.read_object_temp_raw()
+                if temp_raw is not None:
+                    cal_raw[selected_row - 1] = temp_raw
+                    dirty = True
+
+        # Tabella di salto indicizzata dall'id evento
+        handlers = (on_up, on_down, on_left, on_right, on_fire)
+
+        # Gli IRQ sostituiscono quelli del menu sugli stessi pin (ripristinati dal menu)
+        for btn in events:
+            btn.irq(trigger=Pin.IRQ_FALLING, handler=on_irq)
+
+        # Loop principale menu calibrazione: attende gli eventi invece di interrogare i pin
+        try:
+            while running:
+                if dirty:
+                    draw_screen()
+                    dirty = False
+                if head == tail:
+                    idle()
+                    continue
+                ev = ring[tail]
+                tail = (tail + 1) & (_EV_QUEUE - 1)
+                handlers[ev]()
+        finally:
+            for btn in events:
+                btn.irq(handler=None)
 
         # Cleanup sensore
         del sensor
-        import gc
         gc.collect()
 
     def _get_emissivity_materials(self):
@@ -401,8 +336,6 @@ class SetupApp:
 
     def _read_emissivity_eeprom(self):
         """Legge il valore di emissività dalla EEPROM e lo mostra"""
-        import time
-
         if not self.i2c:
             self.display.fill(0)
             self.display.text("I2C not", 0, 10, 1)
@@ -437,9 +370,6 @@ class SetupApp:
 
     def _write_emissivity_eeprom(self):
         """Scrive il valore di emissività selezionato sulla EEPROM"""
-        import time
-        from machine import Pin
-
         if not self.i2c:
             self.display.fill(0)
             self.display.text("I2C not", 0, 10, 1)
@@ -514,14 +444,18 @@ class SetupApp:
         self.display.text("Saving...", 0, 0, 1)
         self.display.show()
 
+        # La scrittura su flash rientra nel secondo di conferma invece di allungarlo
+        start = ticks_ms()
         if self.config.save():
             self.display.text("Saved!", 0, 12, 1)
         else:
             self.display.text("Error!", 0, 12, 1)
 
-        self.display.show()
-        import time
-        time.sleep(1)
+        # Cambia solo la riga dell'esito (y 12..19 = pagine 1-2): niente frame intero
+        self.display.show_pages(1, 2)
+        remaining = _CONFIRM_MS - ticks_diff(ticks_ms(), start)
+        if remaining > 0:
+            time.sleep_ms(remaining)
 
         self.exit_requested = True
         # Forza uscita impostando current_items a lista vuota
@@ -534,7 +468,6 @@ class SetupApp:
         self.display.text("Exiting...", 0, 0, 1)
         self.display.text("Not saved!", 0, 12, 1)
         self.display.show()
-        import time
         time.sleep(1)
 
         self.exit_requested = True
@@ -549,7 +482,6 @@ class SetupApp:
         self.display.text("SmartThermo", 20, 10, 1)
         self.display.text("SETUP", 45, 30, 1)
         self.display.show()
-        import time
         time.sleep(1)
 
         # Costruisce il menu
@@ -0,0 +1,61 @@
+"""
+Schema del menu di setup
+Solo dati (tuple, stringhe e costanti): congelato nel firmware resta in flash
+e l'import non copia nulla in RAM. getter/setter e azioni sono legati a
+SetupApp da setup.py al momento della costruzione del menu.
+"""
+from micropython import const
+
+# Limiti dei valori interi
+REFRESH_MIN = const(50)
+REFRESH_MAX = const(1000)
+REFRESH_STEP = const(50)
+TARGET_MIN = const(0)
+TARGET_MAX = const(150)
+
+# Scelte fisse delle liste
+WIFI_MODES = ("Off", "AP", "STA", "BOTH")
+READING_MODES = ("OnShoot", "Continue")
+
+# Una tupla per voce:
+#   ('level', etichetta, voci)
+#   ('action', etichetta, nome del metodo di SetupApp)
+#   ('label', etichetta)
+#   ('bool'|'ip', etichetta, path, default)
+#   ('list', etichetta, path, default, scelte o nome del metodo che le fornisce)
+#   ('int'|'float', etichetta, path, default, min, max, step)
+SCHEMA = (
+    ('level', "Wifi", (
+        ('list', "Mode", 'wifi.mode', 'AP', WIFI_MODES),
+        ('list', "SSID", 'wifi.selected', None, '_get_known_ssids'),
+    )),
+    ('level', "Prefs", (
+        ('bool', "Laser", 'preferences.laser', True),
+        ('bool', "BigNum", 'preferences.bignum', False),
+        ('list', "Reading", 'preferences.reading', 'OnShoot', READING_MODES),
+        ('int', "Refresh", 'preferences.refresh', 500, REFRESH_MIN, REFRESH_MAX, REFRESH_STEP),
+    )),
+    ('level', "Thermostat", (
+        ('bool', "Active", 'thermostat.active', False),
+        ('int', "Target", 'thermostat.target', 50, TARGET_MIN, TARGET_MAX, 1),
+        ('float', "P", 'thermostat.p', 1.0, 0.0, 10.0, 0.1),
+        ('float', "I", 'thermostat.i', 0.0, 0.0, 10.0, 0.1),
+        ('float', "D", 'thermostat.d', 0.0, 0.0, 10.0, 0.1),
+        ('action', "Tune PID", '_autotune_pid'),
+    )),
+    ('level', "Tapo", (
+        ('bool', "Enable", 'tapo.enabled', False),
+        ('ip', "IP", 'tapo.ip', '192.168.137.242'),
+    )),
+    ('level', "Emissiv", (
+        ('list', "Material", 'emissivity.material_type', 'KNSB', '_get_emissivity_materials'),
+        ('float', "Custom", 'emissivity.custom_value', 0.90, 0.1, 1.0, 0.01),
+        ('label', "---"),
+        ('action', "Read EEPROM", '_read_emissivity_eeprom'),
+        ('action', "Write EEPROM", '_write_emissivity_eeprom'),
+    )),
+    ('action', "Calibr", '_calibration_menu'),
+    ('label', "---"),
+    ('action', "Save & Exit", '_save_and_exit'),
+    ('action', "Exit", '_exit_without_save'),
+)
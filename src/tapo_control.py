@@ -11,7 +11,7 @@ import time
 class TapoP100:
     """Controller per Tapo P100 smart plug"""
 
-    def __init__(self, ip, email, password):
+    def __init__(self, ip, email, password, timeout=5):
         """
         Inizializza il controller Tapo
 
@@ -19,10 +19,12 @@ class TapoP100:
             ip: indirizzo IP del dispositivo
             email: email account Tapo
             password: password account Tapo
+            timeout: timeout socket delle richieste HTTP (secondi)
         """
         self.ip = ip
         self.email = email
         self.password = password
+        self.timeout = timeout
         self.token = None
         self.cookie = None
         self._state = None
@@ -47,7 +49,7 @@ class TapoP100:
             }
 
             # Richiesta semplificata - potrebbe richiedere autenticazione
-            response = urequests.post(url, json=payload, timeout=5)
+            response = urequests.post(url, json=payload, timeout=self.timeout)
             result = response.json()
             response.close()
 
@@ -69,7 +71,7 @@ class TapoP100:
                 }
             }
 
-            response = urequests.post(url, json=payload, timeout=5)
+            response = urequests.post(url, json=payload, timeout=self.timeout)
             result = response.json()
             response.close()
 
@@ -93,7 +95,7 @@ class TapoP100:
                 "method": "get_device_info"
             }
 
-            response = urequests.post(url, json=payload, timeout=5)
+            response = urequests.post(url, json=payload, timeout=self.timeout)
             result = response.json()
             response.close()
 
@@ -2,10 +2,13 @@
 Web Server con API REST per SmartThermo
 Server HTTP asincrono leggero per MicroPython
 """
-import socket
 import json
 import gc
-import select
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
 
 
 class WebServer:
@@ -25,12 +28,13 @@ class WebServer:
         self.config = config
         self.sensor = sensor
         self.app_state = app_state
-        self.server_socket = None
+        self.server = None
+        self.port = 80
         self.running = False
 
     def start(self, port=80):
         """
-        Avvia il server web
+        Abilita il server web (le connessioni sono servite da serve())
 
         Args:
             port: porta su cui ascoltare (default 80)
@@ -40,105 +44,57 @@ class WebServer:
             print("No IP address available")
             return False
 
-        try:
-            # Crea socket
-            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.server_socket.bind(('0.0.0.0', port))
-            self.server_socket.listen(5)
-            self.server_socket.setblocking(False)
-
-            self.running = True
-            print(f"Web server started on http://{ip}:{port}")
-            return True
+        self.port = port
+        self.running = True
+        print(f"Web server started on http://{ip}:{port}")
+        return True
 
+    async def serve(self):
+        """Task asyncio: accetta connessioni finché il server è attivo"""
+        try:
+            self.server = await asyncio.start_server(self._handle_client, '0.0.0.0', self.port)
         except Exception as e:
             print(f"Error starting web server: {e}")
-            return False
+            self.running = False
+            return
+
+        while self.running:
+            await asyncio.sleep_ms(500)
 
     def stop(self):
         """Ferma il server"""
         self.running = False
-        if self.server_socket:
-            self.server_socket.close()
-            self.server_socket = None
+        if self.server:
+            self.server.close()
+            self.server = None
         print("Web server stopped")
 
-    def handle_requests(self, timeout_ms=100):
-        """
-        Gestisce le richieste in arrivo (chiamare nel loop principale)
-
-        Args:
-            timeout_ms: timeout in millisecondi per select
-        """
-        if not self.running or not self.server_socket:
-            return
-
-        try:
-            # Check for incoming connections
-            readable, _, _ = select.select([self.server_socket], [], [], timeout_ms / 1000.0)
-
-            if self.server_socket in readable:
-                client_socket, addr = self.server_socket.accept()
-                client_socket.settimeout(3.0)
-                self._handle_client(client_socket)
-
-        except OSError:
-            pass  # No connection available
-        except Exception as e:
-            print(f"Error handling request: {e}")
-
-    def _send_string(self, sock, data):
+    async def _send_string(self, writer, data):
         """Invia una stringa in chunk"""
         data_bytes = data.encode('utf-8')
-        total_sent = 0
-        chunk_size = 512
-
-        while total_sent < len(data_bytes):
-            chunk = data_bytes[total_sent:total_sent + chunk_size]
-            sent = sock.send(chunk)
-            if sent == 0:
-                break
-            total_sent += sent
-
-    def _send_response_chunked(self, sock, headers, body):
-        """Invia headers e body separatamente in chunk"""
-        # Invia headers
-        self._send_string(sock, headers)
-
-        # Invia body in chunk più grandi (direttamente da stringa)
-        body_bytes = body.encode('utf-8')
         chunk_size = 512
-        offset = 0
 
-        while offset < len(body_bytes):
-            chunk = body_bytes[offset:offset + chunk_size]
-            sent = sock.send(chunk)
-            if sent == 0:
-                break
-            offset += sent
-            gc.collect()  # Libera memoria durante l'invio
+        for offset in range(0, len(data_bytes), chunk_size):
+            writer.write(data_bytes[offset:offset + chunk_size])
+            await writer.drain()
 
-    def _handle_client(self, client_socket):
+    async def _handle_client(self, reader, writer):
         """Gestisce una richiesta client"""
         try:
             # Leggi richiesta
-            request = client_socket.recv(1024).decode('utf-8')
+            request = (await asyncio.wait_for(reader.read(1024), 3)).decode('utf-8')
 
             if not request:
-                client_socket.close()
                 return
 
             # Parse richiesta
             lines = request.split('\r\n')
             if not lines:
-                client_socket.close()
                 return
 
             # Prima riga: GET /path HTTP/1.1
             request_line = lines[0].split(' ')
             if len(request_line) < 2:
-                client_socket.close()
                 return
 
             method = request_line[0]
@@ -162,21 +118,22 @@ class WebServer:
             if isinstance(response, tuple):
                 # Nuova modalità: headers e body separati
                 headers, body = response
-                self._send_response_chunked(client_socket, headers, body)
+                await self._send_string(writer, headers)
+                await self._send_string(writer, body)
             else:
                 # Vecchia modalità: stringa unica (per JSON API)
-                self._send_string(client_socket, response)
-
-            client_socket.close()
-
-            gc.collect()
+                await self._send_string(writer, response)
 
         except Exception as e:
             print(f"Error handling client: {e}")
+
+        finally:
             try:
-                client_socket.close()
+                writer.close()
+                await writer.wait_closed()
             except:
                 pass
+            gc.collect()
 
     def _route_request(self, method, path, body):
         """
@@ -292,7 +249,7 @@ class WebServer:
         try:
             data = json.loads(body)
             # Aggiorna configurazione
-            self.config._data = data
+            self.config.replace(data)
             self.config.save()
             return self._json_response({'success': True})
         except Exception as e:
@@ -251,6 +251,15 @@ class WiFiManager:
 
         return status
 
+    def link_state(self):
+        """
+        Stato dei collegamenti senza interrogare IP/SSID (economico, per il polling)
+
+        Returns:
+            Tupla (sta connesso, ap attivo)
+        """
+        return (self.sta.isconnected(), self.ap.active())
+
     def get_ip(self):
         """
         Ottiene l'IP principale da usare per il server web